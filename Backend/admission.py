@@ -0,0 +1,378 @@
+"""
+Admission Control
+Per-client rate limiting and fair scheduling of resume analyses. A client is the
+email behind its Google credential ("Authorization: Bearer <credential>", once
+verified through /api/auth/google) or else its IP address. Deployments where
+many anonymous users share an IP (campus NAT) can raise ADMISSION_IP_USERS.
+
+Every analysis is charged an estimated cost, in pages, against the client's
+token bucket and then waits for one of a fixed number of analysis slots. Slots
+are handed out by weighted fair queueing, so a client scripting hundreds of
+uploads gets its share of the pipeline rather than all of it. Requests over the
+rate limit, or that would queue too long, are refused with 429 and Retry-After.
+Limits are enforced per worker process.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from auth import email_for_credential_async
+from profiling import is_admin
+from resume_analyzer.parser import MAX_PAGES
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+# Token bucket per client: sustained cost units (pages) per second, and the burst
+# allowed on top; a rate of 0 disables rate limiting
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "0.5"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "20"))
+# Analyses running at once in this process; the rest wait in the fair queue
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", str(os.cpu_count() or 2)))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_QUEUED_PER_CLIENT = int(os.getenv("ADMISSION_MAX_QUEUED_PER_CLIENT", "4"))
+# Longest a request waits for a slot before it is shed
+ADMISSION_MAX_WAIT_MS = float(os.getenv("ADMISSION_MAX_WAIT_MS", "10000"))
+# Fair-queue share of a signed-in user relative to an anonymous IP
+ADMISSION_AUTHENTICATED_WEIGHT = float(os.getenv("ADMISSION_AUTHENTICATED_WEIGHT", "2"))
+# Users an anonymous IP stands for (campus and office NAT): its rate and burst
+# are this many times a client's, and its queue allowance too, up to an eighth
+# of ADMISSION_MAX_QUEUE. Opt-in, since scripted abuse usually comes without a
+# token; by default an anonymous IP gets the same allowance as a signed-in user
+ADMISSION_IP_USERS = max(1.0, float(os.getenv("ADMISSION_IP_USERS", "1")))
+# Take the client IP from X-Forwarded-For; only safe behind a proxy that sets it
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "0") == "1"
+# Trusted proxies in front of the app. Each appends the address it received the
+# request from, so the client is this many entries from the right; entries
+# further left are whatever the client sent and are ignored
+FORWARDED_PROXY_HOPS = max(1, int(os.getenv("FORWARDED_PROXY_HOPS", "1")))
+# Idle clients beyond this many are forgotten, oldest first
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+
+# Files whose pages cannot be counted (compressed object streams) are charged
+# one cost unit per this many bytes
+BYTES_PER_COST_UNIT = 64 * 1024
+_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+router = APIRouter(prefix="/api/admin/admission", tags=["admin"])
+
+
+async def client_identity(request: Request) -> Tuple[str, float]:
+    """
+    Identify the client of a request.
+
+    Returns:
+        (client key, fair-queue weight): "user:<email>" for a verified
+        credential, otherwise "ip:<address>"
+    """
+    authorization = request.headers.get("Authorization", "")
+    if authorization.lower().startswith("bearer "):
+        email = await email_for_credential_async(authorization[7:].strip())
+        if email:
+            return f"user:{email.lower()}", ADMISSION_AUTHENTICATED_WEIGHT
+
+    address = None
+    if TRUST_FORWARDED_FOR:
+        forwarded = [
+            entry.strip()
+            for header in request.headers.getlist("X-Forwarded-For")
+            for entry in header.split(",")
+        ]
+        if len(forwarded) >= FORWARDED_PROXY_HOPS:
+            address = forwarded[-FORWARDED_PROXY_HOPS] or None
+    if address is None:
+        address = request.client.host if request.client else "unknown"
+    return f"ip:{address}", 1.0
+
+
+def estimate_cost(content: bytes) -> float:
+    """Estimated work of analyzing a PDF, in pages (extraction stops at MAX_PAGES)"""
+    pages = len(_PAGE_PATTERN.findall(content))
+    if not pages:
+        pages = math.ceil(len(content) / BYTES_PER_COST_UNIT)
+    return float(max(1, min(pages, MAX_PAGES)))
+
+
+def _reject(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        """
+        Take cost tokens if available.
+
+        Returns:
+            0 if taken, otherwise the seconds until they would be
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A single request larger than the burst would otherwise never fit
+        cost = min(cost, self.burst)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class ClientState:
+    def __init__(self, key: str, weight: float, now: float):
+        self.key = key
+        self.weight = weight
+        users = ADMISSION_IP_USERS if key.startswith("ip:") else 1
+        self.bucket = TokenBucket(ADMISSION_RATE * users, ADMISSION_BURST * users, now) if ADMISSION_RATE > 0 else None
+        self.max_queued = ADMISSION_MAX_QUEUED_PER_CLIENT
+        if users > 1:
+            self.max_queued = max(self.max_queued, min(round(self.max_queued * users), ADMISSION_MAX_QUEUE // 8))
+        # Virtual finish time of the client's last scheduled analysis
+        self.finish_tag = 0.0
+        self.queued = 0
+        self.running = 0
+        self.usage = {
+            "requests": 0, "admitted": 0, "rate_limited": 0, "queue_full": 0, "timed_out": 0,
+            "cost": 0.0, "wait_seconds": 0.0, "busy_seconds": 0.0,
+        }
+        self.last_seen = now
+
+    def snapshot(self) -> Dict:
+        usage = {
+            name: round(value, 3) if isinstance(value, float) else value
+            for name, value in self.usage.items()
+        }
+        if self.bucket is not None:
+            tokens = min(self.bucket.burst, self.bucket.tokens + (time.monotonic() - self.bucket.updated) * self.bucket.rate)
+            usage["tokens"] = round(tokens, 2)
+        return {"client": self.key, "weight": self.weight, "queued": self.queued, "running": self.running, **usage}
+
+
+class _Waiter:
+    __slots__ = ("client", "cost", "start_tag", "future", "cancelled")
+
+    def __init__(self, client: ClientState, cost: float, start_tag: float, future: asyncio.Future):
+        self.client = client
+        self.cost = cost
+        self.start_tag = start_tag
+        self.future = future
+        self.cancelled = False
+
+
+class FairScheduler:
+    """
+    Token-bucket admission plus weighted fair queueing of analysis slots.
+
+    Each queued analysis gets a virtual start tag, the later of the scheduler's
+    virtual time and its client's previous finish tag, and a finish tag of
+    start + cost / weight. Free slots go to the smallest finish tag, and the
+    virtual time advances to the start tag of each analysis dispatched, so a
+    backlogged client's tags run ahead of everyone else's while newcomers start
+    at the current virtual time. Runs on the event loop; the lock only guards
+    reads from threadpool endpoints.
+    """
+
+    def __init__(self, concurrency: int = ADMISSION_CONCURRENCY):
+        self.concurrency = concurrency
+        self._clients: "OrderedDict[str, ClientState]" = OrderedDict()
+        self._waiting: List[tuple] = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._queued = 0
+        self._queued_cost = 0.0
+        self._virtual_time = 0.0
+        # Moving average of service time per cost unit, for Retry-After estimates
+        self._seconds_per_cost = 0.5
+        self._lock = threading.Lock()
+
+    def _client(self, key: str, weight: float, now: float) -> ClientState:
+        client = self._clients.get(key)
+        if client is None:
+            client = self._clients[key] = ClientState(key, weight, now)
+            if len(self._clients) > ADMISSION_MAX_CLIENTS:
+                for old_key, old in list(self._clients.items()):
+                    if len(self._clients) <= ADMISSION_MAX_CLIENTS:
+                        break
+                    if old is not client and not old.queued and not old.running:
+                        del self._clients[old_key]
+        else:
+            self._clients.move_to_end(key)
+        client.last_seen = now
+        return client
+
+    def _queue_delay(self) -> float:
+        """Rough seconds until the current queue drains"""
+        return self._queued_cost * self._seconds_per_cost / max(self.concurrency, 1)
+
+    def check(self, key: str, weight: float, cost: float):
+        """
+        Charge a request to its client, or raise 429 if it should be shed.
+
+        Raises:
+            HTTPException: 429 with Retry-After when the client is over its rate
+                limit or the queue has no room for it
+        """
+        if not ADMISSION_ENABLED:
+            return
+        now = time.monotonic()
+        with self._lock:
+            client = self._client(key, weight, now)
+            client.usage["requests"] += 1
+            if self._running >= self.concurrency:
+                if self._queued >= ADMISSION_MAX_QUEUE:
+                    client.usage["queue_full"] += 1
+                    raise _reject("Server is busy, please retry later", self._queue_delay())
+                if client.queued >= client.max_queued:
+                    client.usage["queue_full"] += 1
+                    raise _reject("Too many analyses queued for this client", self._queue_delay())
+            if client.bucket is not None:
+                wait = client.bucket.take(cost, now)
+                if wait:
+                    client.usage["rate_limited"] += 1
+                    raise _reject("Rate limit exceeded for this client", wait)
+
+    def _tags(self, client: ClientState, cost: float) -> Tuple[float, float]:
+        start_tag = max(self._virtual_time, client.finish_tag)
+        client.finish_tag = start_tag + cost / client.weight
+        return start_tag, client.finish_tag
+
+    def _dispatch(self):
+        while self._waiting and self._running < self.concurrency:
+            _, _, waiter = heapq.heappop(self._waiting)
+            if waiter.cancelled:
+                continue
+            waiter.client.queued -= 1
+            self._queued -= 1
+            self._queued_cost -= waiter.cost
+            waiter.client.running += 1
+            self._running += 1
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            waiter.future.set_result(True)
+
+    def _abandon(self, waiter: _Waiter):
+        waiter.cancelled = True
+        waiter.client.queued -= 1
+        self._queued -= 1
+        self._queued_cost -= waiter.cost
+
+    def _release(self, client: ClientState, cost: float, busy: float):
+        with self._lock:
+            client.running -= 1
+            self._running -= 1
+            client.usage["busy_seconds"] += busy
+            if busy > 0:
+                self._seconds_per_cost = 0.9 * self._seconds_per_cost + 0.1 * busy / cost
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, key: str, weight: float, cost: float):
+        """
+        Hold an analysis slot for the duration of the block.
+
+        Raises:
+            HTTPException: 429 with Retry-After if no slot frees up within
+                ADMISSION_MAX_WAIT_MS
+        """
+        if not ADMISSION_ENABLED:
+            yield
+            return
+
+        queued_at = time.monotonic()
+        waiter = None
+        with self._lock:
+            client = self._client(key, weight, queued_at)
+            start_tag, finish_tag = self._tags(client, cost)
+            if self._running < self.concurrency and not self._queued:
+                client.running += 1
+                self._running += 1
+                self._virtual_time = max(self._virtual_time, start_tag)
+            else:
+                waiter = _Waiter(client, cost, start_tag, asyncio.get_running_loop().create_future())
+                heapq.heappush(self._waiting, (finish_tag, next(self._sequence), waiter))
+                client.queued += 1
+                self._queued += 1
+                self._queued_cost += cost
+
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout=ADMISSION_MAX_WAIT_MS / 1000)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if not waiter.future.done():
+                        self._abandon(waiter)
+                        client.usage["timed_out"] += 1
+                        raise _reject("Timed out waiting for an analysis slot", self._queue_delay())
+            except asyncio.CancelledError:
+                # The client went away while queued; give up the place, or the slot if just granted
+                with self._lock:
+                    granted = waiter.future.done()
+                    if not granted:
+                        self._abandon(waiter)
+                if granted:
+                    self._release(client, cost, 0.0)
+                raise
+
+        started = time.monotonic()
+        with self._lock:
+            client.usage["admitted"] += 1
+            client.usage["cost"] += cost
+            client.usage["wait_seconds"] += started - queued_at
+        try:
+            yield
+        finally:
+            self._release(client, cost, time.monotonic() - started)
+
+    def usage(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            client = self._clients.get(key)
+            return client.snapshot() if client else None
+
+    def clients(self, limit: int = 100) -> List[Dict]:
+        """Usage counters of the busiest clients, by cost admitted"""
+        with self._lock:
+            snapshots = [client.snapshot() for client in self._clients.values()]
+        snapshots.sort(key=lambda usage: usage["cost"], reverse=True)
+        return snapshots[:limit]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            totals: Dict[str, float] = {}
+            for client in self._clients.values():
+                for name, value in client.usage.items():
+                    totals[name] = totals.get(name, 0) + value
+            return {
+                "enabled": ADMISSION_ENABLED,
+                "concurrency": self.concurrency,
+                "running": self._running,
+                "queued": self._queued,
+                "queued_cost": round(self._queued_cost, 1),
+                "seconds_per_cost": round(self._seconds_per_cost, 4),
+                "clients": len(self._clients),
+                **{name: round(value, 3) for name, value in totals.items()},
+            }
+
+
+scheduler = FairScheduler()
+
+
+@router.get("")
+def admission_usage(limit: int = 100, x_admin_token: Optional[str] = Header(None)):
+    """Per-client usage counters, busiest clients first"""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return {"stats": scheduler.stats(), "clients": scheduler.clients(limit)}
@@ -2,13 +2,135 @@
 Google OAuth Authentication Module
 Handles Google Sign-In token verification
 """
+from collections import OrderedDict
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import Optional
+import hashlib
 import httpx
 import os
+import sqlite3
+import threading
+import time
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+# Credentials verified here are remembered (by hash) until they expire, so other
+# endpoints can identify the caller from "Authorization: Bearer <credential>"
+# without calling Google again. The SQLite file shares them between worker
+# processes (serve.py forks several); each process keeps recent ones in memory.
+# The store can block for seconds under write contention, so async code reaches
+# it through the threadpool (email_for_credential_async, remember_credential_async).
+VERIFIED_CREDENTIALS_MAX = int(os.getenv("VERIFIED_CREDENTIALS_MAX", "10000"))
+# Empty to keep verified credentials per process
+VERIFIED_CREDENTIALS_PATH = os.getenv(
+    "VERIFIED_CREDENTIALS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "verified_credentials.sqlite3")
+)
+_verified_credentials: "OrderedDict[str, tuple]" = OrderedDict()
+_verified_lock = threading.Lock()
+_shared_local = threading.local()
+
+
+def _credential_key(credential: str) -> str:
+    return hashlib.sha256(credential.encode("utf-8")).hexdigest()
+
+
+def _shared_connection() -> Optional[sqlite3.Connection]:
+    """This thread's connection to the shared credential store (one per forked process)"""
+    if not VERIFIED_CREDENTIALS_PATH:
+        return None
+    conn = getattr(_shared_local, "conn", None)
+    if conn is not None and _shared_local.pid == os.getpid():
+        return conn
+    os.makedirs(os.path.dirname(VERIFIED_CREDENTIALS_PATH), exist_ok=True)
+    conn = sqlite3.connect(VERIFIED_CREDENTIALS_PATH, timeout=10.0, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS verified_credentials ("
+        " key TEXT PRIMARY KEY,"
+        " email TEXT NOT NULL,"
+        " expires_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_verified_credentials_expiry ON verified_credentials (expires_at)")
+    _shared_local.conn = conn
+    _shared_local.pid = os.getpid()
+    return conn
+
+
+def _remember_locally(key: str, email: str, expires_at: float):
+    with _verified_lock:
+        _verified_credentials[key] = (email, expires_at)
+        _verified_credentials.move_to_end(key)
+        while len(_verified_credentials) > VERIFIED_CREDENTIALS_MAX:
+            _verified_credentials.popitem(last=False)
+
+
+def remember_credential(credential: str, email: str, expires_at: float):
+    """Remember a verified credential in this process and the shared store (blocking)"""
+    key = _credential_key(credential)
+    _remember_locally(key, email, expires_at)
+    # Store errors, including an unusable path, only cost other workers a
+    # lookup miss (anonymous admission)
+    try:
+        conn = _shared_connection()
+        if conn is not None:
+            conn.execute(
+                "INSERT OR REPLACE INTO verified_credentials (key, email, expires_at) VALUES (?, ?, ?)",
+                (key, email, expires_at)
+            )
+            conn.execute("DELETE FROM verified_credentials WHERE expires_at <= ?", (time.time(),))
+    except (sqlite3.Error, OSError):
+        pass
+
+
+async def remember_credential_async(credential: str, email: str, expires_at: float):
+    await run_in_threadpool(remember_credential, credential, email, expires_at)
+
+
+def _remembered_email(key: str) -> Optional[str]:
+    """Email of a credential verified by this process, if still valid"""
+    with _verified_lock:
+        entry = _verified_credentials.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del _verified_credentials[key]
+            return None
+    return entry[0]
+
+
+def _shared_email(key: str) -> Optional[str]:
+    """Email of a credential verified by any worker process, if still valid (blocking)"""
+    try:
+        conn = _shared_connection()
+        row = conn.execute(
+            "SELECT email, expires_at FROM verified_credentials WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone() if conn is not None else None
+    except (sqlite3.Error, OSError):
+        return None
+    if row is None:
+        return None
+    _remember_locally(key, row[0], row[1])
+    return row[0]
+
+
+def email_for_credential(credential: str) -> Optional[str]:
+    """Email of a credential previously verified by /api/auth/google, if still valid (blocking)"""
+    key = _credential_key(credential)
+    return _remembered_email(key) or _shared_email(key)
+
+
+async def email_for_credential_async(credential: str) -> Optional[str]:
+    """email_for_credential that only leaves the event loop when the shared store is needed"""
+    key = _credential_key(credential)
+    email = _remembered_email(key)
+    if email is not None or not VERIFIED_CREDENTIALS_PATH:
+        return email
+    return await run_in_threadpool(_shared_email, key)
+
 
 class GoogleCredentialRequest(BaseModel):
     credential: str
@@ -61,6 +183,12 @@ async def verify_google_token(request: GoogleCredentialRequest):
                     detail="Email not found in token"
                 )
             
+            try:
+                expires_at = float(token_info.get("exp", 0))
+            except (TypeError, ValueError):
+                expires_at = 0.0
+            await remember_credential_async(credential, user_data["email"], expires_at or time.time() + 3600)
+            
             return user_data
             
     except httpx.RequestError as e:
@@ -0,0 +1,297 @@
+"""
+Offline Batch Scoring
+Scores a directory or archive (.zip, .tar, .tar.gz) of resume PDFs against one
+or more job roles without going through the HTTP API.
+
+Extraction and keyword scoring run in a process pool; semantic similarity is
+encoded in batches in the main process. Every finished batch is appended to a
+JSONL journal next to the output, so an interrupted run resumes where it left
+off when started again with the same output path.
+
+Usage:
+    python batch_score.py resumes/ --roles "Software Engineer,Data Analyst" -o scores.csv
+    python batch_score.py drive.zip --all-roles -o scores.parquet --workers 8
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from resume_analyzer.job_roles_dataset import JOB_ROLES_DATASET, get_all_job_roles, get_job_role_data
+from resume_analyzer.scorer import extract_resume_matches, score_from_matches
+from resume_analyzer.text_cache import extract_pdf_cached
+
+OUTPUT_FIELDS = [
+    "file", "role", "score", "similarity", "required_skills", "technical_skills",
+    "soft_skills", "education", "experience", "years_experience", "matched_skills",
+    "missing_skills", "page_count", "backend", "error",
+]
+OUTPUT_FORMATS = ("csv", "jsonl", "parquet")
+
+
+def iter_inputs(source: str) -> Iterator[Tuple[str, Optional[str], Optional[Callable[[], bytes]]]]:
+    """
+    Yield (key, path, read) for every PDF in a directory or archive.
+
+    Directory entries are passed by path; archive members by a read() that
+    returns their content, to be called before the next item is taken, so
+    members a resumed run skips are never decompressed.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(".pdf"):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, source), path, None
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(".pdf"):
+                    yield info.filename, None, lambda info=info: archive.read(info)
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source) as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(".pdf"):
+                    yield member.name, None, lambda member=member: archive.extractfile(member).read()
+    else:
+        raise ValueError(f"{source} is not a directory, zip or tar archive")
+
+
+def _process_file(item: Tuple[str, Optional[str], Optional[bytes], List[str]]) -> Dict:
+    """Worker: extract one PDF and compute its keyword matches for every role"""
+    key, path, content, roles = item
+    temp_path = None
+    try:
+        if path is None:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+                temp_file.write(content)
+                temp_path = path = temp_file.name
+        extraction = extract_pdf_cached(path, content)
+        text = extraction["text"]
+        if not text or len(text.strip()) < 50:
+            raise ValueError("Resume PDF appears to be empty or could not be parsed")
+        return {
+            "key": key,
+            "text": text,
+            "page_count": extraction["page_count"],
+            "backend": extraction["backend"],
+            "matches": {role: extract_resume_matches(text, get_job_role_data(role)) for role in roles},
+        }
+    except Exception as e:
+        return {"key": key, "error": str(e)}
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def _row(key: str, role: str, processed: Dict, similarity: float) -> Dict:
+    score_result = score_from_matches(
+        matches=processed["matches"][role],
+        job_role_data=get_job_role_data(role),
+        similarity_score=similarity,
+        has_content=len(processed["text"].strip()) > 100
+    )
+    matched = score_result["matched_skills"]
+    missing = score_result["missing_skills"]
+    return {
+        "file": key,
+        "role": role,
+        "score": score_result["overall_score"],
+        "similarity": similarity,
+        **score_result["breakdown"],
+        "years_experience": score_result["experience_metrics"]["years"],
+        "matched_skills": ";".join(sorted(set(matched["required"] + matched["technical"] + matched["soft"]))),
+        "missing_skills": ";".join(sorted(set(missing["required"] + missing["technical"]))),
+        "page_count": processed["page_count"],
+        "backend": processed["backend"],
+        "error": "",
+    }
+
+
+def _error_rows(key: str, roles: List[str], error: str) -> List[Dict]:
+    return [{**{field: None for field in OUTPUT_FIELDS}, "file": key, "role": role, "error": error} for role in roles]
+
+
+def _read_journal(journal_path: str) -> List[Dict]:
+    rows = []
+    with open(journal_path) as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+    return rows
+
+
+def trim_partial_line(journal_path: str):
+    """Cut a truncated last line off the journal, so new rows are not appended to it"""
+    if not os.path.exists(journal_path):
+        return
+    with open(journal_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(64 * 1024, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                position = position - step + newline + 1
+                break
+            position -= step
+        if position < end:
+            f.truncate(position)
+
+
+def load_journal(journal_path: str, roles: List[str]) -> Set[str]:
+    """Files a previous run already scored against every role"""
+    if not os.path.exists(journal_path):
+        return set()
+    scored: Dict[str, Set[str]] = {}
+    for row in _read_journal(journal_path):
+        scored.setdefault(row["file"], set()).add(row["role"])
+    return {key for key, scored_roles in scored.items() if scored_roles.issuperset(roles)}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("Parquet output requires pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def write_output(journal_path: str, output_path: str, output_format: str):
+    """Convert the journal into the requested output format"""
+    # Files interrupted mid-batch are scored again on resume; keep the latest row
+    rows = list({(row["file"], row["role"]): row for row in _read_journal(journal_path)}.values())
+
+    if output_format == "jsonl":
+        with open(output_path, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+    elif output_format == "csv":
+        with open(output_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    elif output_format == "parquet":
+        pyarrow = _import_pyarrow()
+        table = pyarrow.Table.from_pylist(rows)
+        pyarrow.parquet.write_table(table, output_path)
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+
+def _chunks(items: Iterator, size: int) -> Iterator[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(args) -> int:
+    roles = get_all_job_roles() if args.all_roles else [role.strip() for role in args.roles.split(",") if role.strip()]
+    unknown = [role for role in roles if role not in JOB_ROLES_DATASET]
+    if not roles or unknown:
+        print(f"Unknown or missing roles: {unknown}. Available: {', '.join(get_all_job_roles())}", file=sys.stderr)
+        return 2
+
+    # Checked before scoring starts rather than when the output is written at the end
+    output_format = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if output_format not in OUTPUT_FORMATS:
+        print(f"Unknown output format {output_format!r}; use an extension or --format of "
+              f"{', '.join(OUTPUT_FORMATS)}", file=sys.stderr)
+        return 2
+    if output_format == "parquet":
+        _import_pyarrow()
+
+    journal_path = args.output + ".journal.jsonl"
+    trim_partial_line(journal_path)
+    done = load_journal(journal_path, roles)
+    if done:
+        print(f"Resuming: {len(done)} files already scored", file=sys.stderr)
+
+    pending = (
+        (key, path, read() if read else None, roles)
+        for key, path, read in iter_inputs(args.source)
+        if key not in done
+    )
+
+    # Spawned workers do not inherit the encoder loaded in this process
+    context = multiprocessing.get_context("spawn")
+    processed_count = 0
+    failed_count = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool, \
+            open(journal_path, "a") as journal:
+        for chunk in _chunks(pending, args.batch_size):
+            results = list(pool.map(_process_file, chunk, chunksize=max(1, len(chunk) // (args.workers * 4))))
+            scored = [result for result in results if "error" not in result]
+
+            similarities = [[0.0] * len(roles) for _ in scored]
+            if scored and not args.no_semantic:
+                from resume_analyzer.embedder import calculate_similarity_matrix
+                similarities = calculate_similarity_matrix(
+                    [result["text"] for result in scored],
+                    [get_job_role_data(role).get("description", "") for role in roles]
+                )
+
+            for result, row_similarities in zip(scored, similarities):
+                for role, similarity in zip(roles, row_similarities):
+                    journal.write(json.dumps(_row(result["key"], role, result, similarity)) + "\n")
+            for result in results:
+                if "error" in result:
+                    failed_count += 1
+                    for row in _error_rows(result["key"], roles, result["error"]):
+                        journal.write(json.dumps(row) + "\n")
+            journal.flush()
+
+            processed_count += len(results)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{processed_count} files ({failed_count} failed) in {elapsed:.1f}s, "
+                f"{processed_count / elapsed:.1f} files/s",
+                file=sys.stderr
+            )
+
+    write_output(journal_path, args.output, output_format)
+    if not args.keep_journal:
+        os.unlink(journal_path)
+    print(f"Wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a directory or archive of resume PDFs")
+    parser.add_argument("source", help="Directory, .zip or .tar(.gz) of PDFs")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, help="Defaults to the output extension")
+    roles = parser.add_mutually_exclusive_group(required=True)
+    roles.add_argument("--roles", help="Comma-separated job roles")
+    roles.add_argument("--all-roles", action="store_true", help="Score against every job role")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument("--batch-size", type=int, default=256, help="Files per checkpointed batch")
+    parser.add_argument("--no-semantic", action="store_true", help="Skip the embedding similarity bonus")
+    parser.add_argument("--keep-journal", action="store_true", help="Keep the resume journal after finishing")
+    args = parser.parse_args()
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+Load Test Harness
+Drives /api/resume/analyze (and optionally /api/auth/google) with concurrent
+traffic and reports throughput, latency percentiles, error rates and the
+saturation point, failing when a configured SLO is breached.
+
+By default the app is exercised in-process through httpx's ASGI transport, with
+Google's tokeninfo endpoint replaced by a local mock. Pass --url to target a
+running server instead; auth requests then reach whatever tokeninfo endpoint
+that server calls, so keep --auth-fraction at 0 unless it is mocked there too.
+
+Repeating the same few files mostly measures the text cache, request coalescing
+and duplicate reuse. --unique-uploads re-renders each resume's text plus a
+unique line into a fresh PDF per request, so every upload runs the full pipeline
+(on a simpler PDF than the original, so extraction itself gets cheaper).
+Every non-2xx response counts as an error; 429s and other 4xx are also
+reported separately.
+
+Admission control limits each client, so in-process runs spread the traffic
+over --users distinct clients, each signed in through the mocked
+/api/auth/google before measuring and sending its credential as a Bearer token.
+They also turn per-client rate limiting off, since virtual users upload far
+faster than people do; pass --rate-limit to keep it. Against --url all requests
+are anonymous from this machine's IP, since signing in would send every fake
+credential to Google's tokeninfo; run the server with ADMISSION_RATE=0 for a
+capacity test, or pass --sign-in if its tokeninfo endpoint is mocked.
+
+Usage:
+    python benchmarks/loadtest.py --resume a.pdf --resume b.pdf:3 \\
+        --roles "Software Engineer,Data Analyst" --concurrency 1,10,50,200 \\
+        --duration 20 --slo-p95-ms 3000 --slo-error-rate 0.01
+    python benchmarks/loadtest.py --resume a.pdf --rate 5,10,20 --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+LINES_PER_PAGE = 50
+
+
+def _pdf_string(line: str) -> str:
+    line = line.encode("latin-1", "replace").decode("latin-1")
+    return "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def render_pdf(lines: List[str]) -> bytes:
+    """Minimal uncompressed PDF showing the lines in Helvetica, LINES_PER_PAGE per page"""
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    font = 3 + 2 * len(pages)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(len(pages)))}] /Count {len(pages)} >>",
+    ]
+    for i, page_lines in enumerate(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font} 0 R >> >> >>")
+        body = "BT /F1 10 Tf 40 760 Td 14 TL " + " ".join(f"{_pdf_string(line)} '" for line in page_lines) + " ET"
+        body = body.encode("latin-1")
+        objects.append(f"<< /Length {len(body)} >>\nstream\n".encode("latin-1") + body + b"\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        obj = obj if isinstance(obj, bytes) else obj.encode("latin-1")
+        out += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+class ResumeMix:
+    """Weighted choice of resume files and roles"""
+
+    def __init__(self, resume_specs: List[str], roles: List[str], seed: int, unique: bool = False):
+        self.files = []
+        self.weights = []
+        for spec in resume_specs:
+            path, _, weight = spec.partition(":")
+            with open(path, "rb") as f:
+                self.files.append((os.path.basename(path), f.read()))
+            self.weights.append(float(weight) if weight else 1.0)
+        self.roles = roles
+        self.random = random.Random(seed)
+        self.unique = unique
+        self.lines = {}
+        if unique:
+            from resume_analyzer.parser import extract_text_from_pdf
+            for spec in resume_specs:
+                path = spec.partition(":")[0]
+                text = extract_text_from_pdf(path)
+                self.lines[os.path.basename(path)] = [line for line in text.splitlines() if line.strip()]
+
+    def pick(self):
+        name, content = self.random.choices(self.files, weights=self.weights)[0]
+        if self.unique:
+            content = render_pdf(self.lines[name] + [f"Load test upload {uuid.uuid4().hex}"])
+        return name, content, self.random.choice(self.roles)
+
+
+def mock_tokeninfo(request: httpx.Request) -> httpx.Response:
+    """Stands in for https://oauth2.googleapis.com/tokeninfo"""
+    token = request.url.params.get("id_token", "")
+    if token.startswith("invalid"):
+        return httpx.Response(400, json={"error": "invalid_token"})
+    return httpx.Response(200, json={
+        "email": f"{token}@example.com",
+        "name": "Load Test",
+        "picture": "",
+        "email_verified": True,
+    })
+
+
+def install_auth_mock():
+    """Route auth.py's outgoing httpx calls to the in-process tokeninfo mock"""
+    original = httpx.AsyncClient
+
+    class MockedAsyncClient(original):
+        def __init__(self, *args, **kwargs):
+            kwargs.setdefault("transport", httpx.MockTransport(mock_tokeninfo))
+            super().__init__(*args, **kwargs)
+
+    httpx.AsyncClient = MockedAsyncClient
+    return original
+
+
+class Identities:
+    """Load test clients, one credential per virtual user"""
+
+    def __init__(self, count: int):
+        self.credentials = [f"loadtest-user{index}" for index in range(count)]
+
+    def headers(self, index: int) -> Dict[str, str]:
+        """Request headers of the client serving virtual user or arrival `index`"""
+        if not self.credentials:
+            return {}
+        return {"Authorization": f"Bearer {self.credentials[index % len(self.credentials)]}"}
+
+    async def sign_in(self, client: httpx.AsyncClient) -> int:
+        """Verify every credential with the server; returns how many it accepted"""
+        async def sign_in_one(credential: str) -> bool:
+            try:
+                response = await client.post("/api/auth/google", json={"credential": credential})
+            except httpx.HTTPError:
+                return False
+            return response.status_code == 200
+
+        return sum(await asyncio.gather(*(sign_in_one(credential) for credential in self.credentials)))
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest rank: the smallest value with at least `fraction` of the sample at or below it
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LevelResult:
+    def __init__(self, label: str):
+        self.label = label
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.rejected = 0
+        self.client_errors = 0
+        self.status_counts: Dict[int, int] = {}
+        self.elapsed = 0.0
+
+    def record(self, latency_ms: float, status: Optional[int]):
+        self.latencies.append(latency_ms)
+        key = status if status is not None else 0
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+        if status is None or not 200 <= status < 300:
+            self.errors += 1
+        if status == 429:
+            self.rejected += 1
+        elif status is not None and 400 <= status < 500:
+            self.client_errors += 1
+
+    def summary(self) -> Dict:
+        values = sorted(self.latencies)
+        count = len(values)
+        return {
+            "level": self.label,
+            "requests": count,
+            "throughput_rps": round(count / self.elapsed, 2) if self.elapsed else 0.0,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "rejected_429": self.rejected,
+            "client_errors_4xx": self.client_errors,
+            "p50_ms": round(percentile(values, 0.50), 1),
+            "p90_ms": round(percentile(values, 0.90), 1),
+            "p95_ms": round(percentile(values, 0.95), 1),
+            "p99_ms": round(percentile(values, 0.99), 1),
+            "mean_ms": round(statistics.fmean(values), 1) if values else 0.0,
+            "status_counts": self.status_counts,
+        }
+
+
+async def send_one(client: httpx.AsyncClient, mix: ResumeMix, auth_fraction: float, result: LevelResult,
+                   headers: Optional[Dict[str, str]] = None):
+    started = time.perf_counter()
+    status = None
+    try:
+        if auth_fraction and mix.random.random() < auth_fraction:
+            response = await client.post("/api/auth/google", json={"credential": f"user{mix.random.randint(0, 999)}"})
+        else:
+            name, content, role = mix.pick()
+            response = await client.post(
+                "/api/resume/analyze",
+                files={"resume": (name, content, "application/pdf")},
+                data={"job_role": role},
+                headers=headers,
+            )
+        status = response.status_code
+    except httpx.HTTPError:
+        pass
+    result.record((time.perf_counter() - started) * 1000, status)
+
+
+async def run_closed_loop(client, mix, concurrency: int, duration: float, auth_fraction: float,
+                          identities: Identities) -> LevelResult:
+    """Keep `concurrency` requests in flight for `duration` seconds"""
+    result = LevelResult(f"concurrency={concurrency}")
+    deadline = time.perf_counter() + duration
+
+    async def user(index: int):
+        headers = identities.headers(index)
+        while time.perf_counter() < deadline:
+            await send_one(client, mix, auth_fraction, result, headers)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(index) for index in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+async def run_open_loop(client, mix, rate: float, duration: float, auth_fraction: float,
+                        identities: Identities) -> LevelResult:
+    """Start requests at Poisson-distributed arrival times averaging `rate` per second"""
+    result = LevelResult(f"rate={rate}/s")
+    tasks = []
+    started = time.perf_counter()
+    next_arrival = started
+    while next_arrival < started + duration:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        headers = identities.headers(len(tasks))
+        tasks.append(asyncio.create_task(send_one(client, mix, auth_fraction, result, headers)))
+        next_arrival += mix.random.expovariate(rate)
+    await asyncio.gather(*tasks)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def find_saturation(summaries: List[Dict], min_gain: float = 0.10) -> Optional[str]:
+    """First level at which adding load no longer raises throughput meaningfully"""
+    for previous, current in zip(summaries, summaries[1:]):
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 + min_gain):
+            return previous["level"]
+    return None
+
+
+def check_slo(summary: Dict, p95_ms: Optional[float], p99_ms: Optional[float], error_rate: Optional[float]) -> List[str]:
+    breaches = []
+    if p95_ms is not None and summary["p95_ms"] > p95_ms:
+        breaches.append(f"p95 {summary['p95_ms']} ms > {p95_ms} ms")
+    if p99_ms is not None and summary["p99_ms"] > p99_ms:
+        breaches.append(f"p99 {summary['p99_ms']} ms > {p99_ms} ms")
+    if error_rate is not None and summary["error_rate"] > error_rate:
+        breaches.append(f"error rate {summary['error_rate']} > {error_rate}")
+    return breaches
+
+
+def print_table(summaries: List[Dict]):
+    print(f"{'level':<18} {'reqs':>6} {'rps':>8} {'err%':>6} {'429':>5} {'4xx':>5} "
+          f"{'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8}")
+    for s in summaries:
+        print(
+            f"{s['level']:<18} {s['requests']:>6} {s['throughput_rps']:>8.2f} {s['error_rate'] * 100:>6.2f} "
+            f"{s['rejected_429']:>5} {s['client_errors_4xx']:>5} {s['p50_ms']:>8.1f} {s['p90_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f}"
+        )
+
+
+async def run(args) -> int:
+    mix = ResumeMix(args.resume, [role.strip() for role in args.roles.split(",") if role.strip()], args.seed,
+                    args.unique_uploads)
+
+    # Against a real server, sign-in would hit Google's tokeninfo endpoint
+    identities = Identities(args.users if not args.url or args.sign_in else 0)
+
+    original_client = httpx.AsyncClient
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        if not args.rate_limit:
+            os.environ["ADMISSION_RATE"] = "0"
+        from main import app
+        original_client = install_auth_mock()
+        client = original_client(
+            transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=args.timeout
+        )
+
+    if args.rate:
+        levels = [("rate", float(value)) for value in args.rate.split(",")]
+    else:
+        levels = [("concurrency", int(value)) for value in args.concurrency.split(",")]
+
+    summaries = []
+    breaches = []
+    try:
+        async with client:
+            if identities.credentials:
+                signed_in = await identities.sign_in(client)
+                print(f"Signed in {signed_in}/{len(identities.credentials)} load test users")
+                if signed_in < len(identities.credentials):
+                    print("Users that failed to sign in share their IP's admission limits")
+            if args.warmup:
+                warmup = LevelResult("warmup")
+                for _ in range(args.warmup):
+                    await send_one(client, mix, 0.0, warmup, identities.headers(0))
+            for kind, value in levels:
+                if kind == "rate":
+                    result = await run_open_loop(client, mix, value, args.duration, args.auth_fraction, identities)
+                else:
+                    result = await run_closed_loop(client, mix, value, args.duration, args.auth_fraction, identities)
+                summary = result.summary()
+                summaries.append(summary)
+                for breach in check_slo(summary, args.slo_p95_ms, args.slo_p99_ms, args.slo_error_rate):
+                    breaches.append(f"{summary['level']}: {breach}")
+    finally:
+        httpx.AsyncClient = original_client
+
+    print_table(summaries)
+    saturation = find_saturation(summaries)
+    print(f"Saturation point: {saturation or 'not reached'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"levels": summaries, "saturation": saturation, "slo_breaches": breaches}, f, indent=2)
+
+    if breaches:
+        print("SLO breached:")
+        for breach in breaches:
+            print(f"  {breach}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the resume analysis API")
+    parser.add_argument("--resume", action="append", required=True,
+                        help="PDF to upload, optionally weighted as path:weight (repeatable)")
+    parser.add_argument("--roles", default="Software Engineer", help="Comma-separated job roles to pick from")
+    parser.add_argument("--concurrency", default="1,10,50,200", help="Closed-loop concurrency levels")
+    parser.add_argument("--rate", help="Open-loop arrival rates in requests/s (overrides --concurrency)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per level")
+    parser.add_argument("--auth-fraction", type=float, default=0.0,
+                        help="Share of requests sent to /api/auth/google (mocked in-process)")
+    parser.add_argument("--url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--warmup", type=int, default=2, help="Sequential requests before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=200,
+                        help="Distinct clients the traffic is spread over (0 sends anonymous requests)")
+    parser.add_argument("--sign-in", action="store_true",
+                        help="Sign in the --users clients with --url too (only if its tokeninfo is mocked)")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Keep per-client rate limiting on for the in-process app")
+    parser.add_argument("--unique-uploads", action="store_true",
+                        help="Make every upload's bytes and text unique, defeating caches and dedup")
+    parser.add_argument("--slo-p95-ms", type=float)
+    parser.add_argument("--slo-p99-ms", type=float)
+    parser.add_argument("--slo-error-rate", type=float)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+PDF Backend Benchmark
+Times every available extraction backend on a set of PDFs and checks that their
+output matches pdfplumber closely enough to produce the same skill matches;
+exits with status 1 if any backend falls below --min-jaccard or --min-skill-parity.
+tests/test_parser_backends.py runs the same parity checks on generated PDFs.
+With --memory, reports peak memory per page of page-by-page extraction instead,
+next to pdfplumber's pdf.pages loop, which keeps every page alive until close.
+
+Usage:
+    python benchmarks/parser_backends.py resume1.pdf [resume2.pdf ...] [--repeat 5]
+    python benchmarks/parser_backends.py large.pdf --memory
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber  # noqa: E402
+
+from resume_analyzer.parser import BACKENDS, FALLBACK_BACKEND, extract_pdf  # noqa: E402
+from resume_analyzer.scorer import extract_resume_matches  # noqa: E402
+from resume_analyzer.job_roles_dataset import JOB_ROLES_DATASET  # noqa: E402
+
+
+def token_jaccard(a: str, b: str) -> float:
+    tokens_a = set(a.lower().split())
+    tokens_b = set(b.lower().split())
+    if not tokens_a and not tokens_b:
+        return 1.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+def skill_parity(text: str, reference: str) -> float:
+    """Fraction of job roles whose matched skills are identical for both texts"""
+    same = 0
+    for job_role_data in JOB_ROLES_DATASET.values():
+        if extract_resume_matches(text, job_role_data) == extract_resume_matches(reference, job_role_data):
+            same += 1
+    return same / len(JOB_ROLES_DATASET)
+
+
+def benchmark(pdf_paths, repeat: int, min_jaccard: float, min_skill_parity: float) -> list:
+    """Print the timing and parity table, returning the (file, backend) pairs below the thresholds"""
+    backends = [name for name, backend in BACKENDS.items() if backend.is_available()]
+    failures = []
+    print(f"{'file':<30} {'backend':<12} {'median ms':>10} {'min ms':>8} {'pages':>6} {'jaccard':>8} {'skills':>7}")
+    for pdf_path in pdf_paths:
+        reference = extract_pdf(pdf_path, FALLBACK_BACKEND)["text"]
+        for name in backends:
+            timings = []
+            result = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = extract_pdf(pdf_path, name)
+                timings.append((time.perf_counter() - started) * 1000)
+            jaccard = token_jaccard(result["text"], reference)
+            parity = skill_parity(result["text"], reference)
+            if jaccard < min_jaccard or parity < min_skill_parity:
+                failures.append((pdf_path, name))
+            print(
+                f"{os.path.basename(pdf_path)[:30]:<30} {name:<12} "
+                f"{statistics.median(timings):>10.1f} {min(timings):>8.1f} {result['page_count']:>6} "
+                f"{jaccard:>8.3f} {parity:>7.0%}"
+            )
+    return failures
+
+
+def current_rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _retained_pages(pdf_path: str):
+    """The pre-streaming extraction loop, for comparison"""
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            yield page.extract_text() or ""
+
+
+def memory_profile(label: str, pages):
+    """
+    Peak Python heap (tracemalloc) per page and RSS growth over the run.
+
+    tracemalloc only sees Python allocations; native PDFium memory shows up in
+    the RSS column alone.
+    """
+    rss_start = current_rss_kb()
+    tracemalloc.start()
+    page_peaks = []
+    try:
+        for _ in pages:
+            page_peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.reset_peak()
+    finally:
+        final_kb = tracemalloc.get_traced_memory()[0] / 1024
+        tracemalloc.stop()
+    rss_growth = current_rss_kb() - rss_start
+    if not page_peaks:
+        page_peaks = [0.0]
+    print(
+        f"{label:<26} {len(page_peaks):>6} {statistics.fmean(page_peaks):>12.0f} "
+        f"{max(page_peaks):>12.0f} {final_kb:>10.0f} {rss_growth:>10}"
+    )
+
+
+def benchmark_memory(pdf_paths):
+    print(f"{'file / mode':<26} {'pages':>6} {'mean peak kB':>12} {'max peak kB':>12} {'held kB':>10} {'rss +kB':>10}")
+    for pdf_path in pdf_paths:
+        print(os.path.basename(pdf_path))
+        memory_profile("  pdfplumber (pdf.pages)", _retained_pages(pdf_path))
+        for name, backend in BACKENDS.items():
+            if backend.is_available():
+                memory_profile(f"  {name} (streamed)", backend.iter_pages(pdf_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction backends")
+    parser.add_argument("pdfs", nargs="+", help="PDF files to extract")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per backend and file")
+    parser.add_argument("--memory", action="store_true", help="Measure peak memory per page instead of time")
+    parser.add_argument("--min-jaccard", type=float, default=0.95,
+                        help="Lowest token Jaccard against pdfplumber that passes")
+    parser.add_argument("--min-skill-parity", type=float, default=1.0,
+                        help="Lowest share of roles with identical skill matches that passes")
+    args = parser.parse_args()
+    if args.memory:
+        benchmark_memory(args.pdfs)
+        return
+    failures = benchmark(args.pdfs, args.repeat, args.min_jaccard, args.min_skill_parity)
+    for pdf_path, name in failures:
+        print(f"FAIL: {name} output differs from {FALLBACK_BACKEND} on {pdf_path}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from auth import router as auth_router
 from resume_api import router as resume_router
+from profiling import router as profiling_router
+from admission import router as admission_router
 
 app = FastAPI(title="Student Success API", version="1.0.0")
 
@@ -29,6 +31,8 @@ app.add_middleware(
 # Include auth routes
 app.include_router(auth_router)
 app.include_router(resume_router)
+app.include_router(profiling_router)
+app.include_router(admission_router)
 
 @app.get("/")
 def root():
@@ -0,0 +1,185 @@
+"""
+Request Profiling
+Opt-in sampling profiler for resume analyses. Admins trigger it per request with
+the X-Profile header (or ?profile=1) plus X-Admin-Token, and a share of all
+traffic can be sampled with PROFILE_SAMPLE_RATE. Profiles are saved as folded
+stacks, ready for flamegraph.pl or speedscope, and listed under /api/admin/profiles.
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import FileResponse
+
+# Profiling and the admin endpoints are disabled while no token is configured
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+# Fraction of analyze requests profiled without being asked (0 disables)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "profiles")
+)
+# Number of most recent profiles kept on disk
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+
+# Leaf frames in these files are threads parked waiting for work, not doing it
+IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+router = APIRouter(prefix="/api/admin/profiles", tags=["admin"])
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+class StackSampler:
+    """
+    Samples the stacks of all busy threads at a fixed interval.
+
+    Analyses run in threadpool threads, so every thread is sampled rather than
+    just the caller; stacks of other requests running at the same time are
+    included too, under their own thread names.
+    """
+
+    def __init__(self, profile_id: str, metadata: Dict, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.profile_id = profile_id
+        self.metadata = metadata
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{profile_id}", daemon=True)
+        self._started = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.metadata["duration_ms"] = round((time.perf_counter() - self._started) * 1000, 1)
+        self.metadata["samples"] = self.samples
+        try:
+            save_profile(self.profile_id, self.metadata, self.stacks)
+        except OSError:
+            pass
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+def save_profile(profile_id: str, metadata: Dict, stacks: Counter):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.folded"), "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(metadata, f)
+
+    # Drop the oldest profiles beyond the retention limit
+    for stale in _list_metadata()[PROFILE_KEEP:]:
+        for suffix in (".folded", ".json"):
+            try:
+                os.unlink(os.path.join(PROFILE_DIR, stale["profile_id"] + suffix))
+            except OSError:
+                pass
+
+
+def _list_metadata() -> List[Dict]:
+    """Metadata of saved profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    profiles.sort(key=lambda metadata: metadata.get("created", 0), reverse=True)
+    return profiles
+
+
+def start_request_profile(request: Request, content: bytes, target: Optional[str]) -> Optional[StackSampler]:
+    """
+    Start profiling an analysis if an admin asked for it or it was sampled.
+
+    Returns:
+        The running sampler, to be stopped when the analysis finishes, or None
+    """
+    if not PROFILE_ADMIN_TOKEN:
+        return None
+
+    requested = request.headers.get("X-Profile") == "1" or request.query_params.get("profile") == "1"
+    if requested and is_admin(request.headers.get("X-Admin-Token")):
+        trigger = "admin"
+    elif PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        trigger = "sampled"
+    else:
+        return None
+
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    input_hash = hashlib.sha256(content).hexdigest()
+    # Request IDs come from clients, so keep only filename-safe characters
+    safe_request_id = "".join(c for c in request_id if c.isalnum() or c in "-_")[:64] or uuid.uuid4().hex
+    profile_id = f"{safe_request_id}-{input_hash[:12]}"
+
+    sampler = StackSampler(profile_id, {
+        "profile_id": profile_id,
+        "request_id": request_id,
+        "input_hash": input_hash,
+        "input_bytes": len(content),
+        "target": target,
+        "trigger": trigger,
+        "created": time.time(),
+    })
+    sampler.start()
+    return sampler
+
+
+def _require_admin(token: Optional[str]):
+    if not is_admin(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.get("")
+def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """List recently saved profiles, newest first"""
+    _require_admin(x_admin_token)
+    return {"profiles": _list_metadata()}
+
+
+@router.get("/{profile_id}")
+def download_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Download a profile as folded stacks"""
+    _require_admin(x_admin_token)
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.folded")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
@@ -0,0 +1,291 @@
+"""
+Near-Duplicate Resume Detection
+MinHash signatures over word shingles, indexed with banded LSH so that
+near-duplicates of a resume are found without comparing against every stored one
+"""
+import hashlib
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+# Estimated Jaccard similarity at which two resumes count as near-duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+DEDUP_MAX_DOCUMENTS = int(os.getenv("DEDUP_MAX_DOCUMENTS", "500000"))
+# Stored results are far larger than signatures, so fewer are kept
+DEDUP_MAX_RESULTS = int(os.getenv("DEDUP_MAX_RESULTS", "20000"))
+
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 similarity share a bucket with high probability
+NUM_BANDS = 16
+SHINGLE_SIZE = 5
+# Shared buckets copied per lock acquisition when building the cluster report
+CLUSTER_COPY_CHUNK = 4096
+# Shingles hashed per step when computing a signature; bounds the temporary
+# NUM_PERM x block arrays (1 MB each) however long the resume is
+SIGNATURE_BLOCK = 1024
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _permutations(num_perm: int, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    generator = np.random.RandomState(seed)
+    a = generator.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+    b = generator.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the distinct word shingles of a text"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+
+class MinHashLSH:
+    """
+    In-memory MinHash index over resume texts.
+
+    Signatures are NUM_PERM 32-bit values (512 bytes per resume); every band of
+    a signature is hashed to a bucket, and only resumes sharing a bucket are
+    compared. Buckets holding a single document store its ID directly, which
+    keeps the index at roughly 1.5 kB per resume. The oldest documents are
+    evicted past max_documents.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS,
+                 threshold: float = DEDUP_THRESHOLD, max_documents: int = DEDUP_MAX_DOCUMENTS):
+        if num_perm % num_bands:
+            raise ValueError("num_perm must be divisible by num_bands")
+        self.num_perm = num_perm
+        self.num_bands = num_bands
+        self.rows = num_perm // num_bands
+        self.threshold = threshold
+        self.max_documents = max_documents
+        self._a, self._b = _permutations(num_perm)
+        self._signatures: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        # One dict per band: bucket hash -> document ID, or a list of IDs once shared
+        self._buckets: List[Dict[int, object]] = [{} for _ in range(num_bands)]
+        # Keys of the shared (list) buckets per band, so clustering need not scan them all
+        self._shared: List[set] = [set() for _ in range(num_bands)]
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text)
+        if not len(hashes):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        # Universal hashing (a * x + b) mod p; uint64 overflow wraps as in datasketch
+        minimum = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for start in range(0, len(hashes), SIGNATURE_BLOCK):
+                block = hashes[start:start + SIGNATURE_BLOCK]
+                permuted = (np.outer(self._a, block) + self._b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+                np.minimum(minimum, permuted.min(axis=1), out=minimum)
+        return minimum.astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.num_bands)]
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return float(np.count_nonzero(first == second)) / len(first)
+
+    def add(self, doc_id: Hashable, signature: np.ndarray) -> List[Hashable]:
+        """Index a document, returning the IDs of documents evicted to make room"""
+        evicted = []
+        with self._lock:
+            if doc_id in self._signatures:
+                self._signatures.move_to_end(doc_id)
+                return evicted
+            self._signatures[doc_id] = signature
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket is None:
+                    self._buckets[band][key] = doc_id
+                elif isinstance(bucket, list):
+                    bucket.append(doc_id)
+                else:
+                    self._buckets[band][key] = [bucket, doc_id]
+                    self._shared[band].add(key)
+            while len(self._signatures) > self.max_documents:
+                old_id, old_signature = self._signatures.popitem(last=False)
+                self._remove_from_buckets(old_id, old_signature)
+                evicted.append(old_id)
+        return evicted
+
+    def _remove_from_buckets(self, doc_id: Hashable, signature: np.ndarray):
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if isinstance(bucket, list):
+                if doc_id in bucket:
+                    bucket.remove(doc_id)
+                if len(bucket) == 1:
+                    self._buckets[band][key] = bucket[0]
+                    self._shared[band].discard(key)
+            elif bucket == doc_id:
+                del self._buckets[band][key]
+
+    def _candidates(self, signature: np.ndarray) -> set:
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if isinstance(bucket, list):
+                candidates.update(bucket)
+            elif bucket is not None:
+                candidates.add(bucket)
+        return candidates
+
+    def query(self, signature: np.ndarray, threshold: Optional[float] = None) -> List[Tuple[Hashable, float]]:
+        """Indexed documents at or above the threshold, most similar first"""
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            matches = []
+            for doc_id in self._candidates(signature):
+                score = self.similarity(signature, self._signatures[doc_id])
+                if score >= threshold:
+                    matches.append((doc_id, score))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+
+    def clusters(self, min_size: int = 2) -> List[List[Hashable]]:
+        """
+        Groups of near-duplicate documents, largest first.
+
+        Shared buckets are copied a chunk at a time under the lock and the
+        grouping runs outside it, so lookups are never held up for long. The
+        report may therefore mix slightly different moments of the index;
+        signatures are never modified, and documents evicted meanwhile are skipped.
+        """
+        shared = []
+        for band in range(self.num_bands):
+            with self._lock:
+                keys = list(self._shared[band])
+            buckets = self._buckets[band]
+            for start in range(0, len(keys), CLUSTER_COPY_CHUNK):
+                with self._lock:
+                    for key in keys[start:start + CLUSTER_COPY_CHUNK]:
+                        bucket = buckets.get(key)
+                        if isinstance(bucket, list):
+                            shared.append(list(bucket))
+        signatures = self._signatures
+
+        parent = {}
+
+        def find(doc_id):
+            root = doc_id
+            while parent.get(root, root) != root:
+                root = parent[root]
+            parent[doc_id] = root
+            return root
+
+        for bucket in shared:
+            first = bucket[0]
+            first_signature = signatures.get(first)
+            if first_signature is None:
+                continue
+            for other in bucket[1:]:
+                if find(first) == find(other):
+                    continue
+                other_signature = signatures.get(other)
+                if other_signature is not None and self.similarity(first_signature, other_signature) >= self.threshold:
+                    parent[find(other)] = find(first)
+
+        groups: Dict[Hashable, List[Hashable]] = {}
+        for doc_id in parent:
+            groups.setdefault(find(doc_id), []).append(doc_id)
+        clusters = [members for members in groups.values() if len(members) >= min_size]
+        clusters.sort(key=len, reverse=True)
+        return clusters
+
+
+class DuplicateIndex:
+    """
+    MinHash index plus the analysis results of recent resumes.
+
+    MinHash only finds and reports near-duplicates. A stored result is reused
+    only for identical extracted text: shingles ignore punctuation ("node js"
+    and "node.js" look the same) and a one-word edit can still estimate 1.0,
+    while the scorer tells those texts apart.
+    """
+
+    def __init__(self, max_results: int = DEDUP_MAX_RESULTS):
+        self.lsh = MinHashLSH()
+        self.max_results = max_results
+        self._results: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "near_duplicates": 0, "reused": 0}
+
+    def signature(self, text: str) -> np.ndarray:
+        return self.lsh.signature(text)
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        """Identity of an extracted text for result reuse"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def lookup(self, signature: np.ndarray, target: Hashable,
+               text_key: str) -> Tuple[List[Tuple[Hashable, float]], Optional[Dict]]:
+        """
+        Find near-duplicates of a resume and a stored result for its exact text.
+
+        Returns:
+            (matches, reusable) where reusable is {"doc_id", "result"} for a
+            stored result of the same text and target, or None
+        """
+        matches = self.lsh.query(signature)
+        with self._lock:
+            self._stats["lookups"] += 1
+            if matches:
+                self._stats["near_duplicates"] += 1
+            reusable = self._results.get((text_key, target))
+            if reusable is not None:
+                self._results.move_to_end((text_key, target))
+                self._stats["reused"] += 1
+        return matches, reusable
+
+    def add(self, doc_id: Hashable, signature: np.ndarray, target: Hashable,
+            text_key: str, result: Optional[Dict] = None):
+        """Index a resume and optionally store its result for reuse by identical text"""
+        self.lsh.add(doc_id, signature)
+        if result is None:
+            return
+        with self._lock:
+            self._results[(text_key, target)] = {"doc_id": doc_id, "result": result}
+            self._results.move_to_end((text_key, target))
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def report(self, min_size: int = 2) -> Dict:
+        clusters = self.lsh.clusters(min_size)
+        return {
+            "documents": len(self.lsh),
+            "threshold": self.lsh.threshold,
+            "cluster_count": len(clusters),
+            "clusters": [{"size": len(members), "documents": members} for members in clusters],
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["stored_results"] = len(self._results)
+        stats["documents"] = len(self.lsh)
+        return stats
+
+
+duplicate_index = DuplicateIndex()
@@ -1,10 +1,308 @@
+import asyncio
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List
+
+import torch
 from sentence_transformers import SentenceTransformer, util
 
 model = SentenceTransformer("all-MiniLM-L6-v2")
 
+# Embeddings are deterministic for a given text, so unchanged resume chunks and
+# job descriptions can be reused across requests
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+
+_embedding_cache: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+# Encode calls from concurrent requests arriving within the window are run as
+# one batched model.encode; a window of 0 encodes each call directly
+ENCODE_BATCH_WINDOW_MS = float(os.getenv("ENCODE_BATCH_WINDOW_MS", "10"))
+ENCODE_MAX_BATCH_SIZE = int(os.getenv("ENCODE_MAX_BATCH_SIZE", "32"))
+
+
+class BatchingEncoder:
+    """
+    Collects texts from concurrent callers and encodes them in batches.
+
+    Callers block on encode() until their batch has run, or take the futures
+    from submit() and wait on them some other way (see encode_texts_async).
+    The worker thread is started lazily and restarted after a fork, so a
+    preloading master process never owns it.
+    """
+
+    def __init__(self, encoder_model, window_ms: float, max_batch_size: int):
+        self.model = encoder_model
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = None
+        self._thread_pid = None
+        self._start_lock = threading.Lock()
+        # [future, waiters] of texts queued or being encoded, so identical texts
+        # in flight are encoded once
+        self._pending: Dict[str, list] = {}
+        self._pending_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "texts": 0,
+            "coalesced": 0,
+            "skipped": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "queue_wait_ms": 0.0,
+            "encode_ms": 0.0,
+        }
+
+    def encode(self, texts: List[str]) -> List[torch.Tensor]:
+        """Encode texts, returning one embedding tensor per text"""
+        if not texts:
+            return []
+
+        if self.window <= 0:
+            with self._stats_lock:
+                self._stats["calls"] += 1
+                self._stats["texts"] += len(texts)
+            started = time.perf_counter()
+            embeddings = list(self.model.encode(texts, convert_to_tensor=True))
+            self._record_batch(len(texts), 0.0, time.perf_counter() - started)
+            return embeddings
+
+        return [future.result() for future in self.submit(texts)]
+
+    def submit(self, texts: List[str]) -> List[Future]:
+        """
+        Queue texts for encoding without waiting, returning one Future per text.
+
+        Only for a positive batch window. Callers that stop waiting should pass
+        the same texts to abandon().
+        """
+        with self._stats_lock:
+            self._stats["calls"] += 1
+            self._stats["texts"] += len(texts)
+
+        self._ensure_worker()
+        futures = []
+        coalesced = 0
+        for text in texts:
+            with self._pending_lock:
+                entry = self._pending.get(text)
+                if entry is None or entry[0].cancelled():
+                    entry = self._pending[text] = [Future(), 1]
+                    self._queue.put((text, entry[0], time.perf_counter()))
+                else:
+                    entry[1] += 1
+                    coalesced += 1
+            futures.append(entry[0])
+        if coalesced:
+            with self._stats_lock:
+                self._stats["coalesced"] += coalesced
+        return futures
+
+    def abandon(self, texts: List[str]):
+        """Withdraw from texts passed to submit(); those nobody waits for are skipped if still queued"""
+        with self._pending_lock:
+            for text in texts:
+                entry = self._pending.get(text)
+                if entry is None:
+                    continue
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    # Only succeeds while the text has not been taken into a batch
+                    entry[0].cancel()
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        encoded = stats["texts"] - stats["coalesced"] - stats["skipped"]
+        stats["avg_batch_size"] = round(encoded / batches, 2) if batches else 0.0
+        queue_wait_ms = stats.pop("queue_wait_ms")
+        encode_ms = stats.pop("encode_ms")
+        stats["avg_queue_wait_ms"] = round(queue_wait_ms / encoded, 3) if encoded else 0.0
+        stats["avg_encode_ms"] = round(encode_ms / batches, 3) if batches else 0.0
+        stats["window_ms"] = self.window * 1000
+        stats["max_batch_size_limit"] = self.max_batch_size
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._thread_pid != pid or not self._thread.is_alive():
+                if self._thread_pid != pid:
+                    # Anything queued belonged to the parent process
+                    self._queue = queue.Queue()
+                    self._pending = {}
+                self._thread = threading.Thread(target=self._run, name="batching-encoder", daemon=True)
+                self._thread_pid = pid
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Drop texts abandoned by all their callers while queued
+            skipped = []
+            kept = []
+            for item in batch:
+                (kept if item[1].set_running_or_notify_cancel() else skipped).append(item)
+            if skipped:
+                self._release(skipped)
+                batch = kept
+                with self._stats_lock:
+                    self._stats["skipped"] += len(skipped)
+                if not batch:
+                    continue
+
+            started = time.perf_counter()
+            queue_wait = sum(started - enqueued for _, _, enqueued in batch)
+            try:
+                embeddings = self.model.encode([text for text, _, _ in batch], convert_to_tensor=True)
+            except Exception as e:
+                self._release(batch)
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self._record_batch(len(batch), queue_wait, time.perf_counter() - started)
+            self._release(batch)
+            for (_, future, _), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+    def _release(self, batch: List[tuple]):
+        with self._pending_lock:
+            for text, future, _ in batch:
+                entry = self._pending.get(text)
+                if entry is not None and entry[0] is future:
+                    del self._pending[text]
+
+    def _record_batch(self, size: int, queue_wait: float, encode_time: float):
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], size)
+            self._stats["queue_wait_ms"] += queue_wait * 1000
+            self._stats["encode_ms"] += encode_time * 1000
+
+
+batching_encoder = BatchingEncoder(model, ENCODE_BATCH_WINDOW_MS, ENCODE_MAX_BATCH_SIZE)
+
+
+def _cache_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _lookup_cached(texts: List[str]) -> tuple:
+    """(keys, cached embeddings by key, texts to encode by key)"""
+    keys = [_cache_key(text) for text in texts]
+    embeddings = {}
+    missing = {}
+
+    with _embedding_cache_lock:
+        for key, text in zip(keys, texts):
+            if key in _embedding_cache:
+                _embedding_cache.move_to_end(key)
+                embeddings[key] = _embedding_cache[key]
+            else:
+                missing[key] = text
+    return keys, embeddings, missing
+
+
+def _store_encoded(embeddings: Dict, missing: Dict, encoded: List[torch.Tensor]):
+    with _embedding_cache_lock:
+        for key, embedding in zip(missing.keys(), encoded):
+            embeddings[key] = embedding
+            _embedding_cache[key] = embedding
+            _embedding_cache.move_to_end(key)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+
+def encode_texts(texts: List[str]) -> torch.Tensor:
+    """Encode texts, reusing cached embeddings and encoding only the misses in one batch"""
+    keys, embeddings, missing = _lookup_cached(texts)
+    if missing:
+        _store_encoded(embeddings, missing, batching_encoder.encode(list(missing.values())))
+    return torch.stack([embeddings[key] for key in keys])
+
+
+def _consume_result(future: asyncio.Future):
+    if not future.cancelled():
+        future.exception()
+
+
+async def encode_texts_async(texts: List[str]) -> torch.Tensor:
+    """
+    encode_texts for the event loop.
+
+    Waits on the batching encoder's futures instead of blocking a threadpool
+    thread, so requests waiting for the model do not starve extraction of
+    threads. If the caller is cancelled, queued texts nobody else waits for
+    are dropped from the encoder queue.
+    """
+    keys, embeddings, missing = _lookup_cached(texts)
+    if missing:
+        missing_texts = list(missing.values())
+        if batching_encoder.window <= 0:
+            # Unbatched encoding runs in the caller's thread
+            encoded = await asyncio.get_running_loop().run_in_executor(None, batching_encoder.encode, missing_texts)
+        else:
+            waiting = asyncio.gather(*(asyncio.wrap_future(future) for future in batching_encoder.submit(missing_texts)))
+            waiting.add_done_callback(_consume_result)
+            try:
+                # Shielded so that cancelling one caller does not cancel futures shared with others
+                encoded = await asyncio.shield(waiting)
+            except asyncio.CancelledError:
+                batching_encoder.abandon(missing_texts)
+                raise
+        _store_encoded(embeddings, missing, encoded)
+    return torch.stack([embeddings[key] for key in keys])
+
+
 def calculate_similarity(resume_text: str, jd_text: str) -> float:
-    emb1 = model.encode(resume_text, convert_to_tensor=True)
-    emb2 = model.encode(jd_text, convert_to_tensor=True)
+    emb1, emb2 = encode_texts([resume_text, jd_text])
+
+    similarity = util.cos_sim(emb1, emb2)
+    return round(float(similarity[0][0]) * 100, 2)
+
+
+async def calculate_similarity_async(resume_text: str, jd_text: str) -> float:
+    """calculate_similarity for the event loop (see encode_texts_async)"""
+    emb1, emb2 = await encode_texts_async([resume_text, jd_text])
 
     similarity = util.cos_sim(emb1, emb2)
     return round(float(similarity[0][0]) * 100, 2)
+
+
+def calculate_similarity_matrix(resume_texts: List[str], jd_texts: List[str]) -> List[List[float]]:
+    """Similarity of every resume against every job description, as in calculate_similarity"""
+    if not resume_texts or not jd_texts:
+        return [[] for _ in resume_texts]
+    similarity = util.cos_sim(encode_texts(resume_texts), encode_texts(jd_texts))
+    return [[round(float(value) * 100, 2) for value in row] for row in similarity]
+
+
+def get_encoder_stats() -> Dict:
+    """Batching and cache statistics for the encoder"""
+    with _embedding_cache_lock:
+        cache_size = len(_embedding_cache)
+    return {
+        "batching": batching_encoder.stats(),
+        "cache": {"size": cache_size, "max_size": EMBEDDING_CACHE_SIZE},
+    }
@@ -0,0 +1,204 @@
+"""
+Incremental Resume Scoring
+Re-scores edited resume versions by reusing per-chunk results from the previous
+version of the same document
+"""
+import difflib
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from resume_analyzer.scorer import extract_resume_matches, extract_years_of_experience, score_from_matches
+from resume_analyzer.embedder import calculate_similarity
+
+# Number of documents whose latest version is kept for diffing
+MAX_CACHED_DOCUMENTS = int(os.getenv("INCREMENTAL_MAX_DOCUMENTS", "1024"))
+
+SKILL_CATEGORIES = ("required", "technical", "soft", "education")
+
+
+def split_into_chunks(text: str) -> List[str]:
+    """
+    Split resume text into non-empty lines.
+
+    Whitespace inside a line is kept: skill patterns match multi-word skills
+    on single spaces only, so collapsing runs of spaces would find skills the
+    whole-text scorer does not.
+    """
+    chunks = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            chunks.append(line)
+    return chunks
+
+
+def _chunk_key(chunk: str) -> str:
+    return hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+
+
+def merge_chunk_matches(chunk_matches: List[Dict]) -> Dict:
+    """
+    Combine per-chunk matches into the shape returned by extract_resume_matches,
+    except for "years", which has to be extracted from the whole text
+    """
+    merged = {category: set() for category in SKILL_CATEGORIES}
+    merged["experience_count"] = 0
+    for matches in chunk_matches:
+        for category in SKILL_CATEGORIES:
+            merged[category] |= matches[category]
+        merged["experience_count"] += matches["experience_count"]
+    return merged
+
+
+class ResumeVersion:
+    """Latest scored version of a document for one role"""
+
+    def __init__(self, chunks: List[str], chunk_matches: Dict[str, Dict], score: float,
+                 similarity: float, matched_skills: set):
+        self.chunks = chunks
+        self.chunk_matches = chunk_matches
+        self.score = score
+        self.similarity = similarity
+        self.matched_skills = matched_skills
+
+
+class IncrementalScorer:
+    """
+    Scores resume versions keyed by the caller and a user or document ID.
+
+    Skill and experience keyword matches are computed per line, so lines
+    carried over from the previous version are not re-matched. Those patterns
+    never span a line break, so the result equals matching the whole text;
+    years of experience ("4 years of\nexperience") and the similarity are
+    computed on the whole text. Scores therefore match the regular scorer.
+    """
+
+    def __init__(self, max_documents: int = MAX_CACHED_DOCUMENTS):
+        self.max_documents = max_documents
+        self._versions: "OrderedDict[tuple, ResumeVersion]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def score(self, document_id: str, role_name: str, resume_text: str, job_role_data: Dict,
+              similarity_score: Optional[float] = None, owner: str = "") -> Dict:
+        """
+        Score a resume version and report the change against the previous one.
+
+        Args:
+            owner: Identity of the caller (see admission.client_identity); the
+                document ID is client-supplied, so versions are kept per owner
+                and one caller cannot read or replace another's history
+            similarity_score: Semantic similarity already computed by the caller;
+                calculated here when omitted
+
+        Returns:
+            Dictionary with "score_result", "similarity" and "delta"
+        """
+        key = (owner, document_id, role_name)
+        with self._lock:
+            previous = self._versions.get(key)
+
+        chunks = split_into_chunks(resume_text)
+        previous_matches = previous.chunk_matches if previous else {}
+
+        chunk_matches = {}
+        reused = 0
+        for chunk in chunks:
+            chunk_key = _chunk_key(chunk)
+            if chunk_key in chunk_matches:
+                continue
+            if chunk_key in previous_matches:
+                chunk_matches[chunk_key] = previous_matches[chunk_key]
+                reused += 1
+            else:
+                chunk_matches[chunk_key] = extract_resume_matches(chunk, job_role_data)
+
+        # Duplicate lines count once per occurrence, as in the whole-text scorer
+        matches = merge_chunk_matches([chunk_matches[_chunk_key(chunk)] for chunk in chunks])
+        matches["years"] = extract_years_of_experience(resume_text)
+
+        if similarity_score is None:
+            try:
+                similarity_score = calculate_similarity(resume_text, job_role_data.get("description", ""))
+            except Exception:
+                similarity_score = 0.0
+
+        score_result = score_from_matches(
+            matches=matches,
+            job_role_data=job_role_data,
+            similarity_score=similarity_score,
+            has_content=len(resume_text.strip()) > 100
+        )
+
+        matched_skills = set()
+        for category in SKILL_CATEGORIES:
+            matched_skills |= matches[category]
+
+        delta = self._build_delta(previous, chunks, matched_skills, score_result["overall_score"],
+                                  similarity_score, reused)
+
+        with self._lock:
+            self._versions[key] = ResumeVersion(
+                chunks=chunks,
+                chunk_matches=chunk_matches,
+                score=score_result["overall_score"],
+                similarity=similarity_score,
+                matched_skills=matched_skills
+            )
+            self._versions.move_to_end(key)
+            while len(self._versions) > self.max_documents:
+                self._versions.popitem(last=False)
+
+        return {"score_result": score_result, "similarity": similarity_score, "delta": delta}
+
+    @staticmethod
+    def _build_delta(previous: Optional[ResumeVersion], chunks: List[str], matched_skills: set,
+                     score: float, similarity: float, reused: int) -> Dict:
+        if previous is None:
+            return {
+                "previous_score": None,
+                "score": score,
+                "score_change": None,
+                "previous_similarity": None,
+                "similarity": similarity,
+                "added_skills": [],
+                "removed_skills": [],
+                "added_lines": len(chunks),
+                "removed_lines": 0,
+                "reused_chunks": 0,
+                "summary": f"first version, score {score}"
+            }
+
+        added_lines = 0
+        removed_lines = 0
+        matcher = difflib.SequenceMatcher(a=previous.chunks, b=chunks, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag in ("replace", "delete"):
+                removed_lines += i2 - i1
+            if tag in ("replace", "insert"):
+                added_lines += j2 - j1
+
+        added_skills = sorted(matched_skills - previous.matched_skills)
+        removed_skills = sorted(previous.matched_skills - matched_skills)
+
+        parts = [f"+{skill}" for skill in added_skills] + [f"-{skill}" for skill in removed_skills]
+        parts.append(f"score {previous.score} → {score}")
+
+        return {
+            "previous_score": previous.score,
+            "score": score,
+            "score_change": round(score - previous.score, 1),
+            "previous_similarity": previous.similarity,
+            "similarity": similarity,
+            "added_skills": added_skills,
+            "removed_skills": removed_skills,
+            "added_lines": added_lines,
+            "removed_lines": removed_lines,
+            "reused_chunks": reused,
+            "summary": ", ".join(parts)
+        }
+
+
+incremental_scorer = IncrementalScorer()
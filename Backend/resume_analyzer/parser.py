@@ -1,8 +1,276 @@
+"""
+PDF Text Extraction
+Pluggable extraction backends: a fast text-only engine by default, with
+pdfplumber as the fallback when the fast path yields too little text
+"""
+import os
+from functools import lru_cache
+from importlib import metadata
+from typing import Dict, Iterator, List, Optional
+
 import pdfplumber
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1
+from pdfplumber.page import Page
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Optional fast path
+    pdfium = None
+
+# "auto" tries the fast backend first; any registered backend name forces it
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto")
+# Average characters per page below which fast-path output is not trusted
+MIN_CHARS_PER_PAGE = int(os.getenv("PDF_MIN_CHARS_PER_PAGE", "50"))
+# Extraction stops once either budget is reached (0 means unlimited), so huge
+# uploads cannot hold a worker's memory or CPU for long
+MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", "200000"))
+
+
+@lru_cache(maxsize=None)
+def _package_version(package: str) -> str:
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class ExtractionBackend:
+    """
+    Extracts the text of each page of a PDF.
+
+    Backends yield pages one at a time and release each page's parsed objects
+    before moving on, so memory stays bounded by a single page.
+    """
+
+    name = "base"
+    package = None
+
+    def is_available(self) -> bool:
+        return True
+
+    @property
+    def version(self) -> str:
+        """Identifies the engine and its version; changes whenever output may change"""
+        return f"{self.name}-{_package_version(self.package)}" if self.package else self.name
+
+    def iter_pages(self, pdf_path: str, info: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Yield the text of each page. If given, info receives the document's
+        "page_count" once it is opened (None when the engine cannot tell).
+        """
+        raise NotImplementedError
+
+    def extract_pages(self, pdf_path: str) -> List[str]:
+        return list(self.iter_pages(pdf_path))
+
+
+def _page_tree_count(pdf) -> Optional[int]:
+    """/Count of the document's page tree, without parsing any page"""
+    try:
+        count = resolve1(resolve1(pdf.doc.catalog["Pages"])["Count"])
+    except Exception:
+        return None
+    return count if isinstance(count, int) and count >= 0 else None
+
+
+class PdfplumberBackend(ExtractionBackend):
+    """Layout-aware extraction; slow but handles unusual PDFs well"""
+
+    name = "pdfplumber"
+    package = "pdfplumber"
+
+    def iter_pages(self, pdf_path: str, info: Optional[Dict] = None) -> Iterator[str]:
+        with pdfplumber.open(pdf_path) as pdf:
+            if info is not None:
+                info["page_count"] = _page_tree_count(pdf)
+            # Build pages one by one instead of through pdf.pages, which keeps
+            # every Page (and its cached layout objects) alive until close
+            doctop = 0
+            for index, page_obj in enumerate(PDFPage.create_pages(pdf.doc)):
+                page = Page(pdf, page_obj, page_number=index + 1, initial_doctop=doctop)
+                try:
+                    doctop += page.height
+                    text = page.extract_text() or ""
+                finally:
+                    page.close()
+                yield text
+
+
+class PdfiumBackend(ExtractionBackend):
+    """Text-only extraction through PDFium, without layout analysis"""
+
+    name = "pypdfium2"
+    package = "pypdfium2"
+
+    def is_available(self) -> bool:
+        return pdfium is not None
+
+    def iter_pages(self, pdf_path: str, info: Optional[Dict] = None) -> Iterator[str]:
+        pdf = pdfium.PdfDocument(pdf_path)
+        if info is not None:
+            info["page_count"] = len(pdf)
+        try:
+            for index in range(len(pdf)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+                yield text.replace("\r\n", "\n").replace("\r", "\n")
+        finally:
+            pdf.close()
+
+
+BACKENDS: Dict[str, ExtractionBackend] = {}
+FAST_BACKEND = "pypdfium2"
+FALLBACK_BACKEND = "pdfplumber"
+
+
+def register_backend(backend: ExtractionBackend):
+    """Make a backend selectable by name"""
+    BACKENDS[backend.name] = backend
+
+
+register_backend(PdfplumberBackend())
+register_backend(PdfiumBackend())
+
+
+def get_backend(name: str) -> ExtractionBackend:
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown PDF backend: {name}. Available: {', '.join(BACKENDS)}")
+    if not backend.is_available():
+        raise ValueError(f"PDF backend {name} is not installed")
+    return backend
+
+
+def extractor_version(backend: Optional[str] = None) -> str:
+    """
+    Version string for the extraction configuration; output for the same file
+    only changes when this does
+    """
+    name = backend or PDF_BACKEND
+    budget = f"pages{MAX_PAGES}-chars{MAX_CHARS}"
+    if name != "auto":
+        return f"{get_backend(name).version}:{budget}"
+    versions = [BACKENDS[FALLBACK_BACKEND].version]
+    if BACKENDS[FAST_BACKEND].is_available():
+        versions.insert(0, BACKENDS[FAST_BACKEND].version)
+    return f"auto-{MIN_CHARS_PER_PAGE}:" + "+".join(versions) + f":{budget}"
+
+
+def has_enough_text(pages: List[str], min_chars_per_page: int = MIN_CHARS_PER_PAGE) -> bool:
+    """Whether extracted pages carry enough text to skip the fallback"""
+    if not pages:
+        return False
+    total_chars = sum(len(page.strip()) for page in pages)
+    return total_chars >= min_chars_per_page * len(pages)
+
+
+def _join_pages(pages: List[str]) -> str:
+    return "".join(page + "\n" for page in pages)
+
+
+def _iter_budgeted(backend: ExtractionBackend, pdf_path: str, max_pages: int, max_chars: int,
+                   status: Dict) -> Iterator[str]:
+    """Pages of one backend within the budget, recording in status whether any were left unread"""
+    status["backend"] = backend.name
+    status["truncated"] = False
+    info = {}
+    pages = backend.iter_pages(pdf_path, info)
+    chars = 0
+    try:
+        for count, text in enumerate(pages, start=1):
+            yield text
+            chars += len(text)
+            if (max_pages and count >= max_pages) or (max_chars and chars >= max_chars):
+                # Only a page left over means the budget cut the document short;
+                # without a page count, extracting the next page is the only way to tell
+                page_count = info.get("page_count")
+                if page_count is not None:
+                    status["truncated"] = count < page_count
+                else:
+                    status["truncated"] = next(pages, None) is not None
+                break
+    finally:
+        # Closes the document even when the caller stops early
+        pages.close()
+
+
+def iter_pdf_pages(
+    pdf_path: str,
+    backend: Optional[str] = None,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    status: Optional[Dict] = None
+) -> Iterator[str]:
+    """
+    Yield the text of each page, stopping early once the page or character
+    budget is reached (defaults: PDF_MAX_PAGES, PDF_MAX_CHARS). The page that
+    crosses the character budget is still yielded in full.
+
+    In "auto" mode the fast backend's pages are read (within the budget) before
+    the first one is yielded, since they are only used if they carry enough
+    text; otherwise pdfplumber pages are streamed instead.
+
+    If given, status receives the "backend" used and whether the budget left
+    pages unread ("truncated").
+    """
+    name = backend or PDF_BACKEND
+    max_pages = MAX_PAGES if max_pages is None else max_pages
+    max_chars = MAX_CHARS if max_chars is None else max_chars
+    status = {} if status is None else status
+
+    if name == "auto":
+        fast = BACKENDS[FAST_BACKEND]
+        if fast.is_available():
+            fast_status = {}
+            try:
+                pages = list(_iter_budgeted(fast, pdf_path, max_pages, max_chars, fast_status))
+            except Exception:
+                pages = None
+            if pages is not None and has_enough_text(pages):
+                status.update(fast_status)
+                yield from pages
+                return
+        name = FALLBACK_BACKEND
+
+    yield from _iter_budgeted(get_backend(name), pdf_path, max_pages, max_chars, status)
+
+
+def extract_pdf(
+    pdf_path: str,
+    backend: Optional[str] = None,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None
+) -> Dict:
+    """
+    Extract text from a PDF, page by page within the page/character budget.
+
+    Args:
+        pdf_path: Path to the PDF file
+        backend: Backend name, or "auto" (default from PDF_BACKEND) to use the
+            fast backend with a pdfplumber fallback
+        max_pages: Page budget (default PDF_MAX_PAGES, 0 for unlimited)
+        max_chars: Character budget (default PDF_MAX_CHARS, 0 for unlimited)
+
+    Returns:
+        Dictionary with "text", the number of pages read ("page_count"), the
+        "backend" that produced it and whether a budget cut it short ("truncated")
+    """
+    status = {}
+    pages = list(iter_pdf_pages(pdf_path, backend, max_pages, max_chars, status))
+    return {
+        "text": _join_pages(pages),
+        "page_count": len(pages),
+        "backend": status["backend"],
+        "truncated": status["truncated"]
+    }
+
 
-def extract_text_from_pdf(pdf_path):
-    text = ""
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
-    return text
+def extract_text_from_pdf(pdf_path, backend: Optional[str] = None) -> str:
+    return extract_pdf(pdf_path, backend)["text"]
@@ -1,5 +1,6 @@
 import re
-from typing import Dict, List, Set
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set
 
 
 def normalize_text(text: str) -> str:
@@ -7,16 +8,30 @@ def normalize_text(text: str) -> str:
     return text.lower().strip()
 
 
+@lru_cache(maxsize=None)
+def compile_keyword_pattern(keyword: str) -> "re.Pattern":
+    """Compile and cache the whole-word pattern for a skill or keyword"""
+    return re.compile(r'\b' + re.escape(normalize_text(keyword)) + r'\b')
+
+
+def warm_pattern_cache(job_roles: Iterable[Dict]) -> int:
+    """Precompile keyword patterns for every role, returning the number of patterns"""
+    for job_role_data in job_roles:
+        for field in ("required_skills", "technical_skills", "soft_skills",
+                      "education_keywords", "experience_keywords"):
+            for keyword in job_role_data.get(field, []):
+                compile_keyword_pattern(keyword)
+    return compile_keyword_pattern.cache_info().currsize
+
+
 def extract_skills_from_text(text: str, skill_list: List[str]) -> Set[str]:
     """Extract skills from resume text based on skill list"""
     text_lower = normalize_text(text)
     found_skills = set()
     
     for skill in skill_list:
-        skill_lower = normalize_text(skill)
         # Check for whole word match or as part of compound words
-        pattern = r'\b' + re.escape(skill_lower) + r'\b'
-        if re.search(pattern, text_lower):
+        if compile_keyword_pattern(skill).search(text_lower):
             found_skills.add(skill)
     
     return found_skills
@@ -28,9 +43,8 @@ def count_experience_indicators(text: str, keywords: List[str]) -> int:
     count = 0
     
     for keyword in keywords:
-        keyword_lower = normalize_text(keyword)
         # Count occurrences of experience keywords
-        count += len(re.findall(r'\b' + re.escape(keyword_lower) + r'\b', text_lower))
+        count += len(compile_keyword_pattern(keyword).findall(text_lower))
     
     return count
 
@@ -68,6 +82,18 @@ def calculate_section_score(found_items: Set[str], total_items: List[str], weigh
     return score
 
 
+def extract_resume_matches(resume_text: str, job_role_data: Dict) -> Dict:
+    """Extract matched skills and experience indicators for a job role"""
+    return {
+        "required": extract_skills_from_text(resume_text, job_role_data.get("required_skills", [])),
+        "technical": extract_skills_from_text(resume_text, job_role_data.get("technical_skills", [])),
+        "soft": extract_skills_from_text(resume_text, job_role_data.get("soft_skills", [])),
+        "education": extract_skills_from_text(resume_text, job_role_data.get("education_keywords", [])),
+        "experience_count": count_experience_indicators(resume_text, job_role_data.get("experience_keywords", [])),
+        "years": extract_years_of_experience(resume_text),
+    }
+
+
 def calculate_advanced_resume_score(
     resume_text: str,
     job_role_data: Dict,
@@ -81,6 +107,33 @@ def calculate_advanced_resume_score(
         job_role_data: Job role data from dataset containing required skills, technical skills, etc.
         similarity_score: Semantic similarity score from embedder (0-100)
     
+    Returns:
+        Dictionary containing overall score and breakdown
+    """
+    matches = extract_resume_matches(resume_text, job_role_data)
+    return score_from_matches(
+        matches=matches,
+        job_role_data=job_role_data,
+        similarity_score=similarity_score,
+        has_content=len(resume_text.strip()) > 100
+    )
+
+
+def score_from_matches(
+    matches: Dict,
+    job_role_data: Dict,
+    similarity_score: float = 0.0,
+    has_content: bool = True
+) -> Dict:
+    """
+    Calculate the resume score from already extracted matches
+    
+    Args:
+        matches: Output of extract_resume_matches (or an equivalent merged result)
+        job_role_data: Job role data from dataset containing required skills, technical skills, etc.
+        similarity_score: Semantic similarity score from embedder (0-100)
+        has_content: Whether the resume has enough text to earn the minimum score
+    
     Returns:
         Dictionary containing overall score and breakdown
     """
@@ -93,18 +146,16 @@ def calculate_advanced_resume_score(
         "education": 0.10
     })
     
-    # Extract skills from resume
     required_skills = job_role_data.get("required_skills", [])
     technical_skills = job_role_data.get("technical_skills", [])
     soft_skills = job_role_data.get("soft_skills", [])
     education_keywords = job_role_data.get("education_keywords", [])
-    experience_keywords = job_role_data.get("experience_keywords", [])
     
-    # Find matched skills
-    matched_required = extract_skills_from_text(resume_text, required_skills)
-    matched_technical = extract_skills_from_text(resume_text, technical_skills)
-    matched_soft = extract_skills_from_text(resume_text, soft_skills)
-    matched_education = extract_skills_from_text(resume_text, education_keywords)
+    # Matched skills
+    matched_required = set(matches["required"])
+    matched_technical = set(matches["technical"])
+    matched_soft = set(matches["soft"])
+    matched_education = set(matches["education"])
     
     # Calculate individual scores
     required_score = calculate_section_score(matched_required, required_skills, weights["required_skills"])
@@ -113,8 +164,8 @@ def calculate_advanced_resume_score(
     education_score = calculate_section_score(matched_education, education_keywords, weights["education"])
     
     # Experience score based on keyword density and years
-    experience_count = count_experience_indicators(resume_text, experience_keywords)
-    years_experience = extract_years_of_experience(resume_text)
+    experience_count = matches["experience_count"]
+    years_experience = matches["years"]
     
     # Experience scoring: combination of keywords and years
     experience_keyword_score = min(experience_count * 5, 60)  # Cap at 60
@@ -137,7 +188,7 @@ def calculate_advanced_resume_score(
     final_score = min(base_score + similarity_bonus, 100)
     
     # Ensure minimum score of 15 if resume has any content
-    final_score = max(final_score, 15) if len(resume_text.strip()) > 100 else 0
+    final_score = max(final_score, 15) if has_content else 0
     
     return {
         "overall_score": round(final_score, 1),
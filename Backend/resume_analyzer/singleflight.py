@@ -0,0 +1,44 @@
+"""
+Single-Flight Coalescing
+Concurrent calls with the same key share one execution: the first caller runs
+the work and the others await its result
+"""
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class AsyncSingleFlight:
+    """
+    Deduplicates identical in-flight coroutine calls.
+
+    The work runs in its own task and every caller awaits it through
+    asyncio.shield, so a disconnecting leader does not cancel it for the
+    followers.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self._count("leaders")
+        else:
+            self._count("followers")
+        return await asyncio.shield(task)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["in_flight"] = len(self._tasks)
+        return stats
@@ -0,0 +1,199 @@
+"""
+Extracted Text Cache
+Disk-backed cache of PDF extraction results keyed by file content hash and
+extractor version, shared by all worker processes and kept across restarts
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+from resume_analyzer.parser import extract_pdf, extractor_version
+
+TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE_ENABLED", "1") == "1"
+TEXT_CACHE_PATH = os.getenv(
+    "TEXT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "extracted_text.sqlite3")
+)
+# Upper bound on the compressed text stored; least recently used entries go first
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Last-access times are refreshed at most this often, to keep reads from writing
+ACCESS_UPDATE_INTERVAL = 60.0
+# Size is checked against the bound every this many inserts per process
+EVICTION_CHECK_INTERVAL = 32
+
+
+class TextCache:
+    """
+    SQLite cache of extracted text, compressed with zlib.
+
+    The database runs in WAL mode so several processes can read while one
+    writes; each thread (and each forked process) opens its own connection.
+    Cache errors, including an unusable cache path, are treated as misses so
+    they never fail an analysis.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._stats = {"hits": 0, "misses": 0, "errors": 0, "evicted": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS extracted_text ("
+            " key TEXT PRIMARY KEY,"
+            " text BLOB NOT NULL,"
+            " page_count INTEGER NOT NULL,"
+            " backend TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " truncated INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(extracted_text)")}
+        if "truncated" not in columns:
+            # Caches created before extraction budgets existed
+            try:
+                conn.execute("ALTER TABLE extracted_text ADD COLUMN truncated INTEGER NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:
+                # Another process added it first
+                pass
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_extracted_text_access ON extracted_text (last_access)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    @staticmethod
+    def make_key(content: bytes, version: str) -> str:
+        return hashlib.sha256(content).hexdigest() + ":" + version
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT text, page_count, backend, last_access, truncated FROM extracted_text WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            now = time.time()
+            if now - row[3] > ACCESS_UPDATE_INTERVAL:
+                conn.execute("UPDATE extracted_text SET last_access = ? WHERE key = ?", (now, key))
+            result = {
+                "text": zlib.decompress(row[0]).decode("utf-8"),
+                "page_count": row[1],
+                "backend": row[2],
+                "truncated": bool(row[4])
+            }
+        except (sqlite3.Error, OSError, zlib.error, UnicodeDecodeError):
+            self._count("errors")
+            return None
+        self._count("hits")
+        return result
+
+    def put(self, key: str, result: Dict):
+        compressed = zlib.compress(result["text"].encode("utf-8"), 6)
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO extracted_text"
+                " (key, text, page_count, backend, size, last_access, truncated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, compressed, result["page_count"], result["backend"], len(compressed), time.time(),
+                 int(result.get("truncated", False)))
+            )
+            with self._lock:
+                self._inserts += 1
+                check = self._inserts % EVICTION_CHECK_INTERVAL == 1
+            if check:
+                self.evict()
+        except (sqlite3.Error, OSError):
+            self._count("errors")
+
+    def evict(self):
+        """Drop least recently used entries until the cache is back under 90% of its bound"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extracted_text").fetchone()[0]
+            evicted = 0
+            if total > self.max_bytes:
+                target = int(self.max_bytes * 0.9)
+                rows = conn.execute("SELECT key, size FROM extracted_text ORDER BY last_access").fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= target:
+                        break
+                    stale.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM extracted_text WHERE key = ?", stale)
+                evicted = len(stale)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        if evicted:
+            self._count("evicted", evicted)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        try:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extracted_text"
+            ).fetchone()
+            stats.update({"entries": entries, "size_bytes": size})
+        except (sqlite3.Error, OSError):
+            pass
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+text_cache = TextCache(TEXT_CACHE_PATH, TEXT_CACHE_MAX_BYTES)
+
+
+def extract_pdf_cached(pdf_path: str, content: Optional[bytes] = None) -> Dict:
+    """
+    extract_pdf with the disk cache in front of it.
+
+    Args:
+        pdf_path: Path to the PDF file
+        content: The file bytes, if already in memory
+    """
+    if not TEXT_CACHE_ENABLED:
+        return extract_pdf(pdf_path)
+
+    if content is None:
+        with open(pdf_path, "rb") as f:
+            content = f.read()
+    key = text_cache.make_key(content, extractor_version())
+
+    cached = text_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = extract_pdf(pdf_path)
+    text_cache.put(key, result)
+    return result
+
+
+def get_text_cache_stats() -> Dict:
+    if not TEXT_CACHE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **text_cache.stats()}
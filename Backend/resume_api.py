@@ -2,35 +2,141 @@
 Resume Analysis API
 Handles resume upload, parsing, and scoring against job roles or custom job descriptions
 """
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from typing import Optional
+import asyncio
+import hashlib
+import json
+import logging
 import tempfile
+import time
 import os
-from resume_analyzer.parser import extract_text_from_pdf
-from resume_analyzer.scorer import calculate_advanced_resume_score
+from resume_analyzer.text_cache import extract_pdf_cached, get_text_cache_stats
+from resume_analyzer.scorer import calculate_advanced_resume_score, extract_resume_matches, score_from_matches
 from resume_analyzer.job_roles_dataset import get_job_role_data
-from resume_analyzer.embedder import calculate_similarity
+from resume_analyzer.embedder import calculate_similarity_async, get_encoder_stats
+from resume_analyzer.incremental import incremental_scorer
+from resume_analyzer.singleflight import AsyncSingleFlight
+from resume_analyzer.dedup import DEDUP_ENABLED, duplicate_index
+from profiling import is_admin, start_request_profile
+from admission import client_identity, estimate_cost, scheduler as admission
 
 router = APIRouter(prefix="/api/resume", tags=["resume"])
 
+logger = logging.getLogger(__name__)
 
-@router.post("/analyze")
-async def analyze_resume(
-    resume: UploadFile = File(...),
-    job_role: Optional[str] = Form(None),
-    job_description: Optional[str] = Form(None)
-):
+# Per-endpoint latency budgets in milliseconds, measured from request arrival;
+# 0 disables the deadline. When the semantic stage would overrun it, the
+# keyword-only score is returned marked "degraded"
+ENDPOINT_DEADLINES_MS = {
+    "analyze": float(os.getenv("ANALYZE_DEADLINE_MS", "8000")),
+    "analyze_stream": float(os.getenv("ANALYZE_STREAM_DEADLINE_MS", "15000")),
+}
+# Let semantic work that missed its deadline finish in the background so its
+# embeddings land in the cache for the next request
+FINISH_SEMANTIC_IN_BACKGROUND = os.getenv("FINISH_SEMANTIC_IN_BACKGROUND", "1") == "1"
+# Most overrun semantic tasks kept running at once; beyond it they are cancelled,
+# which also drops their texts from the encoder queue
+BACKGROUND_SEMANTIC_MAX = int(os.getenv("BACKGROUND_SEMANTIC_MAX", "16"))
+_background_semantic = set()
+
+# Identical analyses in flight (double-clicks, client retries) share one run
+analysis_flights = AsyncSingleFlight()
+
+
+def request_deadline(endpoint: str) -> Optional[float]:
+    """Monotonic time by which the endpoint should respond, or None without a budget"""
+    budget_ms = ENDPOINT_DEADLINES_MS.get(endpoint, 0)
+    return time.monotonic() + budget_ms / 1000 if budget_ms > 0 else None
+
+
+def _background_done(task: asyncio.Task):
+    _background_semantic.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background semantic stage failed: %s", task.exception())
+
+
+async def run_within_budget(deadline: Optional[float], fn, *args, **kwargs):
     """
-    Analyze a resume PDF against a job role or custom job description.
-    
-    Args:
-        resume: PDF file to analyze
-        job_role: Predefined job role name (optional if job_description is provided)
-        job_description: Custom job description text (optional if job_role is provided)
-    
+    Await the coroutine function fn, giving up once the deadline passes.
+
+    The semantic stage waits on the batching encoder without holding a
+    threadpool thread, so overrunning work does not starve extraction.
+
     Returns:
-        Analysis results with score, matched/missing skills, strengths, improvements, etc.
+        (True, result) if it finished in time, otherwise (False, None); the work
+        then keeps running in the background if FINISH_SEMANTIC_IN_BACKGROUND is
+        set and fewer than BACKGROUND_SEMANTIC_MAX tasks already are
     """
+    if deadline is None:
+        return True, await fn(*args, **kwargs)
+
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return False, None
+
+    task = asyncio.ensure_future(fn(*args, **kwargs))
+    try:
+        return True, await asyncio.wait_for(asyncio.shield(task), timeout=remaining)
+    except asyncio.TimeoutError:
+        if FINISH_SEMANTIC_IN_BACKGROUND and len(_background_semantic) < BACKGROUND_SEMANTIC_MAX:
+            _background_semantic.add(task)
+            task.add_done_callback(_background_done)
+        else:
+            task.cancel()
+        return False, None
+
+
+def analysis_target(job_role: Optional[str], job_description: Optional[str]) -> tuple:
+    """What a resume is scored against: a job role or a job description hash"""
+    if job_role:
+        return ("role", job_role)
+    return ("jd", hashlib.sha256(job_description.encode("utf-8")).hexdigest())
+
+
+def analysis_key(content: bytes, job_role: Optional[str], job_description: Optional[str],
+                 document_id: Optional[str], client: str) -> tuple:
+    """
+    Identity of an analysis request: PDF content plus what it is scored against,
+    and for incremental requests whose document history it updates
+    """
+    document = (client, document_id) if document_id else None
+    return (hashlib.sha256(content).hexdigest(), analysis_target(job_role, job_description), document)
+
+
+@router.get("/stats")
+def resume_stats():
+    """Runtime statistics of the analysis pipeline"""
+    return {
+        "encoder": get_encoder_stats(),
+        "text_cache": get_text_cache_stats(),
+        "analysis_coalescing": analysis_flights.stats(),
+        "duplicates": duplicate_index.stats(),
+        "admission": admission.stats(),
+    }
+
+
+@router.get("/usage")
+async def client_usage(request: Request):
+    """Admission counters of the calling client (see admission.py)"""
+    client, _ = await client_identity(request)
+    return admission.usage(client) or {"client": client, "requests": 0}
+
+
+@router.get("/duplicates")
+def duplicate_report(min_size: int = 2, limit: int = 100, x_admin_token: Optional[str] = Header(None)):
+    """Clusters of near-duplicate resumes seen so far, largest first (admin only)"""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    report = duplicate_index.report(max(min_size, 2))
+    report["clusters"] = report["clusters"][:limit]
+    return report
+
+
+def _validate_request(resume: UploadFile, job_role: Optional[str], job_description: Optional[str]):
+    """Reject analyze requests with a missing/ambiguous target or a non-PDF file"""
     # Validate input
     if not job_role and not job_description:
         raise HTTPException(
@@ -44,25 +150,243 @@ async def analyze_resume(
             detail="Provide either 'job_role' OR 'job_description', not both"
         )
     
+    if job_role and not get_job_role_data(job_role):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid job role: {job_role}. Available roles: Software Engineer, Associate Software Engineer, Data Analyst, Web Developer, Frontend Developer, Backend Developer, Full Stack Developer, DevOps Engineer, Machine Learning Engineer"
+        )
+    
     # Validate file type
     if not resume.filename.endswith('.pdf'):
         raise HTTPException(
             status_code=400,
             detail="Only PDF files are supported"
         )
+
+
+@router.post("/analyze")
+async def analyze_resume(
+    request: Request,
+    response: Response,
+    resume: UploadFile = File(...),
+    job_role: Optional[str] = Form(None),
+    job_description: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None)
+):
+    """
+    Analyze a resume PDF against a job role or custom job description.
+    
+    Args:
+        resume: PDF file to analyze
+        job_role: Predefined job role name (optional if job_description is provided)
+        job_description: Custom job description text (optional if job_role is provided)
+        document_id: User or document ID; with job_role, enables incremental re-scoring
+            against the version this client previously submitted and adds a "delta" report
+    
+    Returns:
+        Analysis results with score, matched/missing skills, strengths, improvements, etc.
+    
+    Admins can profile a request with the X-Profile header (see profiling.py); the
+    saved profile's ID is returned in the X-Profile-ID response header.
+    
+    Clients over their rate limit, or arriving while the analysis queue is full,
+    get 429 with a Retry-After header (see admission.py).
+    """
+    _validate_request(resume, job_role, job_description)
+    
+    deadline = request_deadline("analyze")
+    content = await resume.read()
+    client, weight = await client_identity(request)
+    cost = estimate_cost(content)
+    admission.check(client, weight, cost)
+    
+    async def admitted_analysis():
+        async with admission.slot(client, weight, cost):
+            return await _analyze_content(content, job_role, job_description, document_id, client, deadline)
+    
+    profiler = start_request_profile(request, content, job_role or job_description)
+    try:
+        return await analysis_flights.do(
+            analysis_key(content, job_role, job_description, document_id, client),
+            admitted_analysis
+        )
+    finally:
+        if profiler:
+            # Joins the sampler and writes the profile files; keep it off the event loop
+            await run_in_threadpool(profiler.stop)
+            response.headers["X-Profile-ID"] = profiler.profile_id
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/analyze/stream")
+async def analyze_resume_stream(
+    request: Request,
+    resume: UploadFile = File(...),
+    job_role: Optional[str] = Form(None),
+    job_description: Optional[str] = Form(None)
+):
+    """
+    Streaming variant of /analyze that reports each stage as a Server-Sent Event.
+    
+    Events, in order: "accepted", "extracted" (page count), "keywords" (keyword-only
+    score and skill breakdown), "semantic" (similarity, or degraded when over budget)
+    and "result" (the same payload as /analyze). A failure ends the stream with an
+    "error" event carrying the status code and detail.
     
+    Admission is checked before the stream starts, so rate-limited clients get a
+    plain 429; a request shed while queued ends with a 429 "error" event.
+    """
+    _validate_request(resume, job_role, job_description)
+    
+    deadline = request_deadline("analyze_stream")
+    content = await resume.read()
+    filename = resume.filename
+    client, weight = await client_identity(request)
+    cost = estimate_cost(content)
+    admission.check(client, weight, cost)
+    
+    async def events():
+        yield _sse_event("accepted", {"filename": filename, "bytes": len(content)})
+        try:
+            async with admission.slot(client, weight, cost):
+                async for event in _stream_stages(content, job_role, job_description, deadline):
+                    yield event
+        except HTTPException as e:
+            error = {"status": e.status_code, "detail": e.detail}
+            if e.headers and "Retry-After" in e.headers:
+                error["retry_after"] = int(e.headers["Retry-After"])
+            yield _sse_event("error", error)
+        except Exception as e:
+            yield _sse_event("error", {"status": 500, "detail": f"Error analyzing resume: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _stream_stages(content: bytes, job_role: Optional[str], job_description: Optional[str],
+                         deadline: Optional[float]):
+    """The SSE events of /analyze/stream after "accepted"; errors propagate to the caller"""
+    extraction = await _extract_resume(content)
+    resume_text = extraction["text"]
+    yield _sse_event("extracted", {
+        "page_count": extraction["page_count"],
+        "characters": len(resume_text),
+        "backend": extraction["backend"],
+        "truncated": extraction.get("truncated", False)
+    })
+    
+    # Keyword matching runs once; the final score below only adds the
+    # semantic bonus to these matches
+    if job_role:
+        job_role_data = get_job_role_data(job_role)
+        matches = await run_in_threadpool(extract_resume_matches, resume_text, job_role_data)
+        has_content = len(resume_text.strip()) > 100
+        keyword_result = score_from_matches(matches, job_role_data, 0.0, has_content)
+        yield _sse_event("keywords", {
+            "keyword_score": keyword_result["overall_score"],
+            "breakdown": keyword_result["breakdown"],
+            "matched_skills": keyword_result["matched_skills"],
+            "missing_skills": keyword_result["missing_skills"],
+            "experience_metrics": keyword_result["experience_metrics"]
+        })
+        similarity_score, degraded = await _semantic_stage(
+            resume_text, job_role_data.get("description", ""), deadline
+        )
+        yield _sse_event("semantic", {"similarity": similarity_score, "degraded": degraded})
+        
+        score_result = keyword_result
+        if similarity_score > 0:
+            score_result = score_from_matches(matches, job_role_data, similarity_score, has_content)
+        result = _role_response(score_result, job_role, similarity_score, degraded)
+    else:
+        job_keywords, matched_keywords, keyword_match_ratio = await run_in_threadpool(
+            match_job_description_keywords, resume_text, job_description
+        )
+        yield _sse_event("keywords", {
+            "keyword_score": round(max(keyword_match_ratio * 60, 15), 1),
+            "matched_skills": matched_keywords[:10],
+            "missing_skills": [kw for kw in job_keywords[:10] if kw not in matched_keywords],
+            "keyword_match_ratio": round(keyword_match_ratio, 3)
+        })
+        similarity_score, degraded = await _semantic_stage(resume_text, job_description, deadline)
+        yield _sse_event("semantic", {"similarity": similarity_score, "degraded": degraded})
+        
+        result = _description_response(
+            job_keywords, matched_keywords, keyword_match_ratio, similarity_score, degraded
+        )
+    yield _sse_event("result", result)
+
+
+def match_job_description_keywords(resume_text: str, job_description: str) -> tuple:
+    """
+    Simple keyword matching for custom job descriptions.
+    
+    Returns:
+        (job_keywords, matched_keywords, keyword_match_ratio)
+    """
+    job_desc_lower = job_description.lower()
+    resume_lower = resume_text.lower()
+    
+    # Extract keywords from job description (simple approach)
+    job_keywords = [word.strip() for word in job_desc_lower.split() if len(word) > 3]
+    matched_keywords = [kw for kw in job_keywords if kw in resume_lower]
+    
+    keyword_match_ratio = len(matched_keywords) / len(job_keywords) if job_keywords else 0
+    return job_keywords, matched_keywords, keyword_match_ratio
+
+
+async def _analyze_content(
+    content: bytes,
+    job_role: Optional[str],
+    job_description: Optional[str],
+    document_id: Optional[str],
+    client: str,
+    deadline: Optional[float] = None
+) -> dict:
+    """Run the analysis pipeline on the uploaded PDF bytes, within the deadline if given"""
+    extraction = await _extract_resume(content)
+    resume_text = extraction["text"]
+    if not DEDUP_ENABLED:
+        return await _score_resume_text(resume_text, job_role, job_description, document_id, client, deadline)
+    
+    # Resumes with identical extracted text (re-exported PDFs) scored against the
+    # same target reuse the stored result; incremental requests always score,
+    # since they also update the document's history
+    doc_id = hashlib.sha256(content).hexdigest()
+    target = analysis_target(job_role, job_description)
+    text_key = duplicate_index.text_key(resume_text)
+    signature = await run_in_threadpool(duplicate_index.signature, resume_text)
+    _, reusable = await run_in_threadpool(duplicate_index.lookup, signature, target, text_key)
+    if reusable and not document_id:
+        await run_in_threadpool(duplicate_index.add, doc_id, signature, target, text_key)
+        return {**reusable["result"], "duplicate_of": {"document": reusable["doc_id"], "similarity": 1.0}}
+    
+    result = await _score_resume_text(resume_text, job_role, job_description, document_id, client, deadline)
+    reusable_result = None if result.get("degraded") or "delta" in result else result
+    await run_in_threadpool(duplicate_index.add, doc_id, signature, target, text_key, reusable_result)
+    return result
+
+
+async def _extract_resume(content: bytes) -> dict:
+    """Extract and validate the text of an uploaded PDF"""
     # Save uploaded file temporarily
-    temp_file = None
+    temp_file_path = None
     try:
         # Create temporary file
         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            content = await resume.read()
             temp_file.write(content)
             temp_file_path = temp_file.name
         
         # Extract text from PDF
         try:
-            resume_text = extract_text_from_pdf(temp_file_path)
+            extraction = await run_in_threadpool(extract_pdf_cached, temp_file_path, content)
+            resume_text = extraction["text"]
         except Exception as e:
             raise HTTPException(
                 status_code=400,
@@ -75,152 +399,215 @@ async def analyze_resume(
                 detail="Resume PDF appears to be empty or could not be parsed"
             )
         
-        # Get job role data or use custom description
-        similarity_score = 0.0
-        job_role_data = None
-        
+        return extraction
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error analyzing resume: {str(e)}"
+        )
+    finally:
+        # Clean up temporary file
+        if temp_file_path and os.path.exists(temp_file_path):
+            try:
+                os.unlink(temp_file_path)
+            except Exception:
+                pass
+
+
+async def _semantic_stage(resume_text: str, jd_text: str, deadline: Optional[float]) -> tuple:
+    """
+    Similarity of the resume to the job text within the deadline.
+    
+    Returns:
+        (similarity_score, degraded); a failed similarity counts as 0 without degrading
+    """
+    try:
+        completed, similarity_score = await run_within_budget(
+            deadline, calculate_similarity_async, resume_text, jd_text
+        )
+    except Exception:
+        # If similarity calculation fails, continue without it
+        return 0.0, False
+    if not completed:
+        return 0.0, True
+    return similarity_score, False
+
+
+def _role_response(score_result: dict, job_role: str, similarity_score: float,
+                   degraded: bool, delta: Optional[dict] = None) -> dict:
+    """Format a job role score result as the /analyze payload"""
+    # Format response
+    matched_skills = (
+        score_result["matched_skills"]["required"] +
+        score_result["matched_skills"]["technical"] +
+        score_result["matched_skills"]["soft"]
+    )
+    
+    missing_skills = (
+        score_result["missing_skills"]["required"] +
+        score_result["missing_skills"]["technical"][:5]  # Limit missing technical skills
+    )
+    
+    # Generate strengths
+    strengths = []
+    if score_result["matched_skills"]["required"]:
+        strengths.append(f"Strong match on required skills: {', '.join(score_result['matched_skills']['required'][:5])}")
+    if score_result["matched_skills"]["technical"]:
+        strengths.append(f"Good technical skills: {', '.join(score_result['matched_skills']['technical'][:5])}")
+    if score_result["experience_metrics"]["years"] > 0:
+        strengths.append(f"Relevant experience: {score_result['experience_metrics']['years']} years")
+    
+    # Generate improvements
+    improvements = []
+    if score_result["missing_skills"]["required"]:
+        improvements.append(f"Add required skills: {', '.join(score_result['missing_skills']['required'][:5])}")
+    if score_result["missing_skills"]["technical"]:
+        improvements.append(f"Consider adding: {', '.join(score_result['missing_skills']['technical'][:5])}")
+    if score_result["experience_metrics"]["years"] == 0:
+        improvements.append("Highlight your experience and projects more clearly")
+    
+    # Generate feedback
+    score = score_result["overall_score"]
+    feedback = f"Your resume scored {score}/100 for the {job_role} role."
+    if similarity_score > 0:
+        feedback += f" Semantic match: {similarity_score}%."
+    
+    if score >= 75:
+        feedback += " Excellent match! You're well-qualified for this role."
+    elif score >= 60:
+        feedback += " Good match! With some improvements, you'll be very competitive."
+    elif score >= 45:
+        feedback += " Moderate match. Consider adding more relevant skills and experience."
+    else:
+        feedback += " Needs improvement. Focus on adding required skills and relevant experience."
+    
+    if matched_skills:
+        feedback += f" Key matched skills: {', '.join(matched_skills[:5])}."
+    
+    response = {
+        "score": score,
+        "similarity": similarity_score,
+        "matched_skills": matched_skills[:10],  # Limit to top 10
+        "missing_skills": missing_skills[:10],  # Limit to top 10
+        "strengths": strengths,
+        "improvements": improvements,
+        "keywords": matched_skills[:15],  # Detected keywords
+        "feedback": feedback,
+        "degraded": degraded
+    }
+    if delta is not None:
+        response["delta"] = delta
+    return response
+
+
+def _description_response(job_keywords: list, matched_keywords: list, keyword_match_ratio: float,
+                          similarity_score: float, degraded: bool) -> dict:
+    """Score against a custom job description and format it as the /analyze payload"""
+    # Calculate score based on keyword match and similarity
+    base_score = keyword_match_ratio * 60  # Base score from keyword matching
+    similarity_bonus = (similarity_score / 100) * 40  # Bonus from semantic similarity
+    final_score = min(base_score + similarity_bonus, 100)
+    final_score = max(final_score, 15)  # Minimum score
+    
+    # Generate response
+    strengths = []
+    if matched_keywords:
+        strengths.append(f"Matched keywords: {', '.join(matched_keywords[:5])}")
+    if similarity_score > 70:
+        strengths.append("Strong semantic similarity with job description")
+    
+    improvements = []
+    if keyword_match_ratio < 0.5:
+        improvements.append("Add more keywords from the job description to your resume")
+    if similarity_score < 50:
+        improvements.append("Improve alignment with job description requirements")
+    
+    feedback = f"Your resume scored {round(final_score, 1)}/100 against the custom job description."
+    if similarity_score > 0:
+        feedback += f" Semantic match: {similarity_score}%."
+    
+    if final_score >= 75:
+        feedback += " Excellent match!"
+    elif final_score >= 60:
+        feedback += " Good match!"
+    elif final_score >= 45:
+        feedback += " Moderate match."
+    else:
+        feedback += " Needs improvement."
+    
+    return {
+        "score": round(final_score, 1),
+        "similarity": similarity_score,
+        "matched_skills": matched_keywords[:10],
+        "missing_skills": [kw for kw in job_keywords[:10] if kw not in matched_keywords],
+        "strengths": strengths,
+        "improvements": improvements,
+        "keywords": matched_keywords[:15],
+        "feedback": feedback,
+        "degraded": degraded
+    }
+
+
+async def _score_resume_text(
+    resume_text: str,
+    job_role: Optional[str],
+    job_description: Optional[str],
+    document_id: Optional[str],
+    client: str = "",
+    deadline: Optional[float] = None
+) -> dict:
+    """Score extracted resume text against a job role or custom job description"""
+    try:
         if job_role:
-            # Use predefined job role dataset
+            # Use predefined job role dataset (validated in _validate_request)
             job_role_data = get_job_role_data(job_role)
-            if not job_role_data:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid job role: {job_role}. Available roles: Software Engineer, Associate Software Engineer, Data Analyst, Web Developer, Frontend Developer, Backend Developer, Full Stack Developer, DevOps Engineer, Machine Learning Engineer"
-                )
             
+            delta = None
+            score_result = None
             # Calculate similarity with job role description
-            try:
-                similarity_score = calculate_similarity(resume_text, job_role_data.get("description", ""))
-            except Exception:
-                # If similarity calculation fails, continue without it
-                similarity_score = 0.0
-            
-            # Calculate advanced score
-            score_result = calculate_advanced_resume_score(
-                resume_text=resume_text,
-                job_role_data=job_role_data,
-                similarity_score=similarity_score
+            similarity_score, degraded = await _semantic_stage(
+                resume_text, job_role_data.get("description", ""), deadline
             )
             
-            # Format response
-            matched_skills = (
-                score_result["matched_skills"]["required"] +
-                score_result["matched_skills"]["technical"] +
-                score_result["matched_skills"]["soft"]
-            )
-            
-            missing_skills = (
-                score_result["missing_skills"]["required"] +
-                score_result["missing_skills"]["technical"][:5]  # Limit missing technical skills
-            )
-            
-            # Generate strengths
-            strengths = []
-            if score_result["matched_skills"]["required"]:
-                strengths.append(f"Strong match on required skills: {', '.join(score_result['matched_skills']['required'][:5])}")
-            if score_result["matched_skills"]["technical"]:
-                strengths.append(f"Good technical skills: {', '.join(score_result['matched_skills']['technical'][:5])}")
-            if score_result["experience_metrics"]["years"] > 0:
-                strengths.append(f"Relevant experience: {score_result['experience_metrics']['years']} years")
-            
-            # Generate improvements
-            improvements = []
-            if score_result["missing_skills"]["required"]:
-                improvements.append(f"Add required skills: {', '.join(score_result['missing_skills']['required'][:5])}")
-            if score_result["missing_skills"]["technical"]:
-                improvements.append(f"Consider adding: {', '.join(score_result['missing_skills']['technical'][:5])}")
-            if score_result["experience_metrics"]["years"] == 0:
-                improvements.append("Highlight your experience and projects more clearly")
-            
-            # Generate feedback
-            score = score_result["overall_score"]
-            feedback = f"Your resume scored {score}/100 for the {job_role} role."
-            if similarity_score > 0:
-                feedback += f" Semantic match: {similarity_score}%."
-            
-            if score >= 75:
-                feedback += " Excellent match! You're well-qualified for this role."
-            elif score >= 60:
-                feedback += " Good match! With some improvements, you'll be very competitive."
-            elif score >= 45:
-                feedback += " Moderate match. Consider adding more relevant skills and experience."
-            else:
-                feedback += " Needs improvement. Focus on adding required skills and relevant experience."
+            if document_id and not degraded:
+                # Reuse unchanged parts of the previous version of this document
+                incremental_result = await run_in_threadpool(
+                    incremental_scorer.score,
+                    document_id=document_id,
+                    role_name=job_role,
+                    resume_text=resume_text,
+                    job_role_data=job_role_data,
+                    similarity_score=similarity_score,
+                    owner=client
+                )
+                score_result = incremental_result["score_result"]
+                delta = incremental_result["delta"]
             
-            if matched_skills:
-                feedback += f" Key matched skills: {', '.join(matched_skills[:5])}."
+            if score_result is None:
+                # Calculate advanced score (keyword-only when the semantic stage was skipped)
+                score_result = calculate_advanced_resume_score(
+                    resume_text=resume_text,
+                    job_role_data=job_role_data,
+                    similarity_score=similarity_score
+                )
             
-            return {
-                "score": score,
-                "similarity": similarity_score,
-                "matched_skills": matched_skills[:10],  # Limit to top 10
-                "missing_skills": missing_skills[:10],  # Limit to top 10
-                "strengths": strengths,
-                "improvements": improvements,
-                "keywords": matched_skills[:15],  # Detected keywords
-                "feedback": feedback
-            }
+            return _role_response(score_result, job_role, similarity_score, degraded, delta)
         
         else:
             # Use custom job description
             # For custom descriptions, use a simpler scoring approach
-            # Calculate similarity
-            try:
-                similarity_score = calculate_similarity(resume_text, job_description)
-            except Exception:
-                similarity_score = 0.0
+            similarity_score, degraded = await _semantic_stage(resume_text, job_description, deadline)
             
             # Simple keyword-based scoring for custom descriptions
-            job_desc_lower = job_description.lower()
-            resume_lower = resume_text.lower()
-            
-            # Extract keywords from job description (simple approach)
-            job_keywords = [word.strip() for word in job_desc_lower.split() if len(word) > 3]
-            matched_keywords = [kw for kw in job_keywords if kw in resume_lower]
-            
-            # Calculate score based on keyword match and similarity
-            keyword_match_ratio = len(matched_keywords) / len(job_keywords) if job_keywords else 0
-            base_score = keyword_match_ratio * 60  # Base score from keyword matching
-            similarity_bonus = (similarity_score / 100) * 40  # Bonus from semantic similarity
-            final_score = min(base_score + similarity_bonus, 100)
-            final_score = max(final_score, 15)  # Minimum score
-            
-            # Generate response
-            strengths = []
-            if matched_keywords:
-                strengths.append(f"Matched keywords: {', '.join(matched_keywords[:5])}")
-            if similarity_score > 70:
-                strengths.append("Strong semantic similarity with job description")
-            
-            improvements = []
-            if keyword_match_ratio < 0.5:
-                improvements.append("Add more keywords from the job description to your resume")
-            if similarity_score < 50:
-                improvements.append("Improve alignment with job description requirements")
-            
-            feedback = f"Your resume scored {round(final_score, 1)}/100 against the custom job description."
-            if similarity_score > 0:
-                feedback += f" Semantic match: {similarity_score}%."
-            
-            if final_score >= 75:
-                feedback += " Excellent match!"
-            elif final_score >= 60:
-                feedback += " Good match!"
-            elif final_score >= 45:
-                feedback += " Moderate match."
-            else:
-                feedback += " Needs improvement."
-            
-            return {
-                "score": round(final_score, 1),
-                "similarity": similarity_score,
-                "matched_skills": matched_keywords[:10],
-                "missing_skills": [kw for kw in job_keywords[:10] if kw not in matched_keywords],
-                "strengths": strengths,
-                "improvements": improvements,
-                "keywords": matched_keywords[:15],
-                "feedback": feedback
-            }
+            job_keywords, matched_keywords, keyword_match_ratio = match_job_description_keywords(
+                resume_text, job_description
+            )
+            return _description_response(
+                job_keywords, matched_keywords, keyword_match_ratio, similarity_score, degraded
+            )
     
     except HTTPException:
         raise
@@ -229,10 +616,3 @@ async def analyze_resume(
             status_code=500,
             detail=f"Error analyzing resume: {str(e)}"
         )
-    finally:
-        # Clean up temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except Exception:
-                pass
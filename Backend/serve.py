@@ -0,0 +1,200 @@
+"""
+Production Server
+Preloads the embedding model and job role registry in a master process, then
+forks uvicorn workers that share them instead of loading a copy each.
+
+Usage:
+    python serve.py            # WEB_CONCURRENCY workers on HOST:PORT
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List
+
+import uvicorn
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Seconds between per-worker memory reports from the master (0 disables)
+MEMORY_REPORT_INTERVAL = int(os.getenv("MEMORY_REPORT_INTERVAL", "60"))
+# A worker exiting within this many seconds of its start counts as a failed start;
+# replacements for those are delayed exponentially, and after this many failed
+# starts in a row the master gives up instead of fork-looping
+WORKER_MIN_UPTIME = float(os.getenv("WORKER_MIN_UPTIME", "10"))
+WORKER_MAX_FAILED_STARTS = int(os.getenv("WORKER_MAX_FAILED_STARTS", "5"))
+RESTART_BACKOFF_MAX = 30.0
+
+logger = logging.getLogger("serve")
+
+
+def memory_usage(pid="self") -> Dict[str, int]:
+    """
+    Memory of a process in kB, read from /proc/<pid>/smaps_rollup.
+
+    "private" is what the process does not share with the master or other
+    workers, i.e. its real per-worker overhead; "pss" splits shared pages
+    evenly between the processes mapping them.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss_kb": fields.get("Rss", 0),
+        "pss_kb": fields.get("Pss", 0),
+        "shared_kb": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def preload():
+    """Import the app and warm everything the workers should share"""
+    import torch
+    from main import app
+    from resume_analyzer.embedder import model
+    from resume_analyzer.job_roles_dataset import JOB_ROLES_DATASET
+    from resume_analyzer.scorer import warm_pattern_cache
+
+    # Inference only: no gradients, weights moved to shared memory so workers
+    # map the same pages rather than relying on copy-on-write alone
+    model.eval()
+    for parameter in model.parameters():
+        parameter.requires_grad_(False)
+    model.share_memory()
+
+    pattern_count = warm_pattern_cache(JOB_ROLES_DATASET.values())
+
+    # Split intra-op threads between workers to avoid oversubscribing cores.
+    # No encode runs in the master: forking after the OpenMP pool has started
+    # can deadlock the children.
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // WORKERS))
+
+    @app.get("/health/memory")
+    def worker_memory():
+        return {"pid": os.getpid(), "memory": memory_usage()}
+
+    # Keep preloaded objects out of the collector so that gc passes in the
+    # workers do not touch (and un-share) their pages
+    gc.collect()
+    gc.freeze()
+
+    logger.info("Preloaded model and %d keyword patterns in master %d", pattern_count, os.getpid())
+    return app
+
+
+def bind_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket):
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level="info")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    os._exit(0)
+
+
+def spawn_worker(app, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(app, sock)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def report_memory(workers: List[int]):
+    master = memory_usage()
+    logger.info("master %d: rss=%d kB", os.getpid(), master["rss_kb"])
+    for pid in workers:
+        try:
+            usage = memory_usage(pid)
+        except OSError:
+            continue
+        logger.info(
+            "worker %d: rss=%d kB pss=%d kB shared=%d kB private=%d kB",
+            pid, usage["rss_kb"], usage["pss_kb"], usage["shared_kb"], usage["private_kb"]
+        )
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    app = preload()
+    sock = bind_socket()
+    # Worker pid -> monotonic start time
+    workers = {spawn_worker(app, sock): time.monotonic() for _ in range(WORKERS)}
+    logger.info("Serving on %s:%d with workers %s", HOST, PORT, list(workers))
+
+    stopping = False
+    exit_code = 0
+    failed_starts = 0
+    # Monotonic times at which replacement workers are due
+    restarts: List[float] = []
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    last_report = time.monotonic()
+    while workers or (restarts and not stopping):
+        while restarts and restarts[0] <= time.monotonic() and not stopping:
+            restarts.pop(0)
+            workers[spawn_worker(app, sock)] = time.monotonic()
+
+        pid = 0
+        if workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+        if pid:
+            started = workers.pop(pid)
+            if not stopping:
+                if time.monotonic() - started < WORKER_MIN_UPTIME:
+                    failed_starts += 1
+                else:
+                    failed_starts = 0
+                if failed_starts >= WORKER_MAX_FAILED_STARTS:
+                    logger.error("Workers exited right after starting %d times in a row, shutting down", failed_starts)
+                    exit_code = 1
+                    stop(None, None)
+                    continue
+                delay = min(RESTART_BACKOFF_MAX, 2 ** (failed_starts - 1)) if failed_starts else 0.0
+                logger.warning("Worker %d exited with status %d, restarting in %.0fs", pid, status, delay)
+                restarts.append(time.monotonic() + delay)
+                restarts.sort()
+            continue
+
+        if MEMORY_REPORT_INTERVAL and time.monotonic() - last_report >= MEMORY_REPORT_INTERVAL:
+            report_memory(list(workers))
+            last_report = time.monotonic()
+        time.sleep(0.5)
+
+    sock.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Output parity of the PDF extraction backends, the "auto" fallback, and the page
+and character budgets. PDFs are rendered on the fly with the load test's writer.
+"""
+import pytest
+
+from loadtest import LINES_PER_PAGE, render_pdf
+from parser_backends import skill_parity, token_jaccard
+from resume_analyzer import parser
+
+pytest.importorskip("pypdfium2")
+
+RESUME_LINES = [
+    "Jane Doe - Software Engineer",
+    "5 years of experience developing python and java microservices",
+    "Skills: docker, kubernetes, sql, git, rest api, react, node.js",
+    "Built data pipelines with pandas, numpy and machine learning models",
+    "Developed and deployed services on aws; led an agile scrum team",
+    "B.Tech computer science; communication, teamwork, problem solving",
+]
+
+
+def _write_pdf(tmp_path, lines, name="resume.pdf") -> str:
+    path = tmp_path / name
+    path.write_bytes(render_pdf(lines))
+    return str(path)
+
+
+@pytest.fixture
+def three_page_pdf(tmp_path):
+    # Three full pages of resume text, repeated with numbered lines
+    lines = [f"{RESUME_LINES[i % len(RESUME_LINES)]} ({i})" for i in range(3 * LINES_PER_PAGE)]
+    return _write_pdf(tmp_path, lines)
+
+
+def test_backends_produce_the_same_tokens_and_skills(three_page_pdf):
+    fast = parser.extract_pdf(three_page_pdf, "pypdfium2", max_pages=0, max_chars=0)
+    reference = parser.extract_pdf(three_page_pdf, "pdfplumber", max_pages=0, max_chars=0)
+
+    assert fast["page_count"] == reference["page_count"] == 3
+    assert set(fast["text"].lower().split()) == set(reference["text"].lower().split())
+    assert token_jaccard(fast["text"], reference["text"]) == 1.0
+    assert skill_parity(fast["text"], reference["text"]) == 1.0
+
+
+def test_auto_uses_the_fast_backend_when_it_has_enough_text(three_page_pdf):
+    result = parser.extract_pdf(three_page_pdf, "auto")
+    assert result["backend"] == "pypdfium2"
+
+
+def test_auto_falls_back_when_fast_text_is_too_short(tmp_path):
+    path = _write_pdf(tmp_path, ["cv"])
+
+    assert not parser.has_enough_text(parser.BACKENDS["pypdfium2"].extract_pages(path))
+    status = {}
+    pages = list(parser.iter_pdf_pages(path, "auto", status=status))
+    assert status["backend"] == "pdfplumber"
+    assert parser.extract_pdf(path, "auto")["backend"] == "pdfplumber"
+    assert "cv" in "".join(pages)
+
+
+def _assert_truncation(tmp_path, backend):
+    two_pages = _write_pdf(tmp_path, RESUME_LINES * 15, "two.pdf")
+    three_pages = _write_pdf(tmp_path, RESUME_LINES * 25, "three.pdf")
+
+    exact = parser.extract_pdf(two_pages, backend, max_pages=2, max_chars=0)
+    assert (exact["page_count"], exact["truncated"]) == (2, False)
+
+    cut = parser.extract_pdf(three_pages, backend, max_pages=2, max_chars=0)
+    assert (cut["page_count"], cut["truncated"]) == (2, True)
+
+    unlimited = parser.extract_pdf(three_pages, backend, max_pages=0, max_chars=0)
+    assert (unlimited["page_count"], unlimited["truncated"]) == (3, False)
+
+
+@pytest.mark.parametrize("backend", ["pypdfium2", "pdfplumber"])
+def test_truncated_only_when_pages_are_left_unread(tmp_path, backend):
+    _assert_truncation(tmp_path, backend)
+
+
+def test_truncation_without_a_page_count(tmp_path, monkeypatch):
+    # An unreadable page tree falls back to peeking at the next page
+    monkeypatch.setattr(parser, "_page_tree_count", lambda pdf: None)
+    _assert_truncation(tmp_path, "pdfplumber")
+
+
+@pytest.mark.parametrize("backend", ["pypdfium2", "pdfplumber"])
+def test_character_budget_keeps_the_crossing_page(tmp_path, backend):
+    path = _write_pdf(tmp_path, RESUME_LINES * 25)
+
+    result = parser.extract_pdf(path, backend, max_pages=0, max_chars=10)
+    assert result["page_count"] == 1
+    assert result["truncated"]
+    assert len(result["text"]) > 10
@@ -97,10 +97,12 @@ const Login = ({ onSuccess, onSwitch }: Props) => {
           email: payload.email,
           provider: 'google',
           picture: payload.picture,
+          credential: response.credential,
         };
         onSuccess(googleUser);
       } else {
-        onSuccess(userData);
+        // Keep the verified credential so API calls can identify the user
+        onSuccess({ ...userData, credential: response.credential });
       }
     } catch (err: any) {
       setGoogleError(err.message || 'Google login failed. Please try again.');
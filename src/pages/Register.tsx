@@ -115,7 +115,7 @@ const Register = ({ onSwitch, onSuccess }: Props) => {
         }
         
         if (onSuccess) {
-          onSuccess(googleUser);
+          onSuccess({ ...googleUser, credential: response.credential });
         }
       } else {
         // Save to localStorage for future logins
@@ -125,7 +125,8 @@ const Register = ({ onSwitch, onSuccess }: Props) => {
         }
         
         if (onSuccess) {
-          onSuccess(userData);
+          // Keep the verified credential so API calls can identify the user
+          onSuccess({ ...userData, credential: response.credential });
         }
       }
     } catch (err: any) {
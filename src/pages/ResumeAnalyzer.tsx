@@ -48,8 +48,20 @@ export const ResumeAnalyzer = () => {
         formData.append('job_role', jobRole);
       }
 
+      // Signed-in users are rate limited individually rather than per IP
+      const headers: Record<string, string> = {};
+      try {
+        const credential = JSON.parse(localStorage.getItem('ml_user') || '{}')?.credential;
+        if (credential) {
+          headers.Authorization = `Bearer ${credential}`;
+        }
+      } catch {
+        // No stored user; send the request anonymously
+      }
+
       const response = await fetch(API_ENDPOINTS.resumeAnalyze, {
         method: 'POST',
+        headers,
         body: formData,
       });
 